@@ -1,101 +1,180 @@
 import azure.functions as func
-import pandas as pd
-from io import BytesIO
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.blob import ContentSettings
 import os
+import functools
 import logging
+import tempfile
 from datetime import datetime
-from sklearn.model_selection import train_test_split
 
+from shared_code import (block_upload, clients, datasets, frame_cache, harmonisation, lazy, manifest, parallel,
+                         partitions, splitting, table_format, telemetry)
+from shared_code.harmonisation import Rule, cycles
+
+# Imported by the first invocation instead of when the worker loads the app's functions
+np = lazy.module('numpy')
+pd = lazy.module('pandas')
+
+# 'csv' or 'parquet' for the train/test outputs (falls back to the app-wide OUTPUT_FORMAT setting)
+OUTPUT_FORMAT = table_format.output_format('GOLD_OUTPUT_FORMAT')
+# Format of the silver-level file loaded when a dataset has a file in each format (falls back to OUTPUT_FORMAT);
+# if none is in this format the most recently modified one is loaded
+INPUT_FORMAT = table_format.output_format('GOLD_INPUT_FORMAT')
+# Maximum concurrent requests to the storage account (listings and downloads)
+MAX_CONCURRENCY = parallel.setting('GOLD_MAX_CONCURRENCY', parallel.DEFAULT_MAX_CONCURRENCY)
+# Processes used to parse the downloaded files; 0 parses in the download threads. One pool is
+# spawned per invocation and shared by all its downloads
+PARSE_PROCESSES = parallel.setting('GOLD_PARSE_PROCESSES', 0)
+# Cache of each year's joined frame: 'off', 'container' (Parquet blobs in GOLD_CACHE_CONTAINER)
+# or 'local' (files in GOLD_CACHE_DIR). A year is only rebuilt when one of its source files changes.
+CACHE_MODE = os.environ.get('GOLD_CACHE', 'off').lower()
+CACHE_CONTAINER = os.environ.get('GOLD_CACHE_CONTAINER', 'gold-cache')
+CACHE_DIR = os.environ.get('GOLD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gold-cache'))
+# Part of every cache fingerprint; bump it whenever the processing or join of a year changes
+CACHE_VERSION = 2
+# Read and keep every column in the compact dtype of COLUMN_DTYPES; false keeps float64 columns
+# and object null columns as they were before
+COMPACT_DTYPES = os.environ.get('GOLD_COMPACT_DTYPES', 'true').lower() not in ('0', 'false', 'no', 'off')
+# How rows are split into train and test: 'hash' assigns each SEQN by a seeded hash and streams both
+# outputs to storage in chunks; 'random' is the original in-memory shuffled split, the same rows as
+# sklearn's train_test_split(random_state=GOLD_SPLIT_SEED)
+SPLIT_MODE = os.environ.get('GOLD_SPLIT', 'hash').lower()
+TEST_SIZE = 0.3
+SPLIT_SEED = parallel.setting('GOLD_SPLIT_SEED', 42)
+# Rows formatted per write when streaming the outputs
+SPLIT_CHUNK_ROWS = parallel.setting('GOLD_SPLIT_CHUNK_ROWS', 50000)
+# How the frame of all years is built: 'memory' concatenates the years in RAM; 'spill' builds one year at
+# a time and spills it to a local Arrow file under GOLD_SPILL_DIR, then streams the outputs from those
+# files, so memory is bounded by the largest year however many years there are
+BUILD_MODE = os.environ.get('GOLD_BUILD', 'memory').lower()
+SPILL_DIR = os.environ.get('GOLD_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'gold-spill'))
+
+@telemetry.instrument('GoldLevel')
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    spilled = None
+    parse_pool = parallel.process_pool(PARSE_PROCESSES) if PARSE_PROCESSES > 0 else None
     try:
         req_body = req.get_json() if req.get_body() else {}
         # Connection string to your Azure Storage account
         connection_string = os.environ['AzureWebJobsStorage']
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        # Reused across invocations of this worker, with its connection pool
+        blob_service_client = clients.blob_service_client(connection_string)
         source_container_client = blob_service_client.get_container_client("silver-level")
         destination_container_client = blob_service_client.get_container_client("gold-level")
 
         final_df = pd.DataFrame()  # Final dataframe to hold all the data
 
         # List directories (which are by year)
-        years = ['1999-2000', '2001-2002', '2003-2004','2005-2006','2007-2008','2009-2010','2011-2012','2013-2014','2015-2016','2017-2020']  # List all years here
-        patterns = ['BMX', 'DBQ', 'DEMO', 'OHQ', 'SLQ','SMQ', 'SMQFAM', 'SMQRTU', 'SMQMEC', 'WHQ','COT']
-        
-        for year in years:
-            year_df = pd.DataFrame()  # DataFrame to hold year-specific data
-
-            # List files in the year directory
-            file_blobs = source_container_client.list_blobs(name_starts_with=f'{year}/')
-            
+        years = list(datasets.YEARS)
+
+        # List the files in all the year directories concurrently
+        def list_year(year):
+            with telemetry.span('gold.list', year=year) as span:
+                blobs = list(source_container_client.list_blobs(name_starts_with=f'{year}/'))
+                span.record(blobs=len(blobs))
+            return blobs
+
+        year_listings = parallel.thread_map(list_year, years, MAX_CONCURRENCY)
+
+        # Collect the dataset files to load (blob name, dataset code, processing function), per year in
+        # listing order, and the name, ETag and modification time of each, which identify the year's inputs
+        year_files = {year: [] for year in years}
+        year_sources = {year: [] for year in years}
+        for year, file_blobs in zip(years, year_listings):
+            dataset_blobs = {}
             for blob in file_blobs:
-                file_name = blob.name.split('/')[1].upper()
-                # if the file has an underscore Remove underscores and any characters after it 
-                if '_' in file_name:
-                    clean_file_name = file_name.split('_')[0]
-                else:
-                    clean_file_name = file_name.split('.')[0]
-
-                # Check if the file name contains any of the patterns
-                if clean_file_name in patterns:
-                    blob_client = source_container_client.get_blob_client(blob)
-                    blob_data = blob_client.download_blob().readall()
-                    data = pd.read_csv(BytesIO(blob_data))  
-                    data.columns = data.columns.str.upper()  # Convert column names to uppercase
-
-                    # Mapping of file names to processing functions
-                    file_processing_functions = {
-                        'BMX': process_bmx_file,
-                        'DBQ': process_dbq_file,
-                        'DEMO': process_demo_file,
-                        'OHQ': process_ohq_file,
-                        'SLQ': process_slq_file,
-                        'SMQ': process_smq_file,
-                        'SMQFAM': process_smqfam_file,
-                        'SMQMEC': process_smqmec_file,
-                        'WHQ': process_whq_file,
-                        'SMQRTU': process_smqrtu_file,
-                        'COT': process_cot_file
-                    }
-
-                    # Apply specific transformations based on the file pattern using the mapping
-                    if clean_file_name in file_processing_functions:
-                        data = file_processing_functions[clean_file_name](year, data)
-                    else:
-                        raise ValueError(f"File name {file_name} does not match any of the patterns.")
-                    # Merge the data from this file to the year-specific DataFrame
-                    if year_df.empty:
-                        year_df = data
-                    else:
-                        year_df = pd.merge(year_df,data, on='SEQN', how='outer')
-                    
-                    year_df['Year'] = year  # Add a column to the year-specific DataFrame to indicate the year
-
-
-            # Add the year-specific data to the final DataFrame using skle
-            final_df = pd.concat([final_df, year_df], axis=0)
-
-        # Split the dataframe into train and test sets
-        train_df, test_df = train_test_split(final_df, test_size=0.3, random_state=42)
-
-        if 'RIDRETH1' in train_df.columns:
-            train_df = train_df.drop(columns=['RIDRETH1'])
-
-        # Upload the final DataFrame to the 'gold-level' container
-        # Convert the train and test DataFrames to CSV
-        train_csv_data = train_df.to_csv(index=False)
-        test_csv_data = test_df.to_csv(index=False)
-
-        # Encode the CSV data to bytes
-        train_csv_bytes = train_csv_data.encode('utf-8')
-        test_csv_bytes = test_csv_data.encode('utf-8')
+                dataset_file = CATALOG.classify(blob.name)
+                if dataset_file is not None:
+                    dataset_blobs[dataset_file] = blob
+            # Only one file per dataset is loaded, e.g. DEMO_C.parquet and not also DEMO_C.csv while the
+            # silver level is switched over to Parquet; both would be joined into _x/_y columns
+            candidates = [(dataset_file, blob.last_modified) for dataset_file, blob in dataset_blobs.items()]
+            for dataset_file in datasets.select_files(candidates, table_format.FILE_EXTENSIONS[INPUT_FORMAT]):
+                blob = dataset_blobs[dataset_file]
+                year_files[year].append(dataset_file)
+                year_sources[year].append((blob.name, blob.etag, blob.last_modified))
+
+        # Reuse the cached frame of every year whose source files are unchanged; {"rebuild": true}
+        # in the request body rebuilds (and re-caches) every year
+        cache = open_year_cache(blob_service_client)
+        year_fingerprints = {year: frame_cache.fingerprint(CACHE_VERSION, COMPACT_DTYPES, year, year_sources[year])
+                             for year in years}
+        use_cache = cache is not None and not req_body.get('rebuild')
+        cache_hits = cache_misses = 0
+
+        def cached_year(year):
+            if not year_files[year]:
+                return None
+            with telemetry.span('gold.cache_get', year=year) as span:
+                df = cache.get(year, year_fingerprints[year])
+                span.record(hits=int(df is not None), rows=0 if df is None else len(df))
+            return df
+
+        def year_frames(group):
+            # The frames of the years in `group`, in order: cached, or built from their files
+            nonlocal cache_hits, cache_misses
+            group_dfs = {}
+            if use_cache:
+                cached_frames = parallel.thread_map(cached_year, group, MAX_CONCURRENCY)
+                group_dfs = {year: df for year, df in zip(group, cached_frames) if df is not None}
+            stale_years = [year for year in group if year not in group_dfs]
+            cache_hits += len(group_dfs)
+            cache_misses += sum(1 for year in stale_years if year_files[year])
+
+            # Download and parse every file of the stale years concurrently, up to MAX_CONCURRENCY at a time.
+            # Only the columns the file's harmonisation rule uses are loaded, in their compact dtypes; CSV or
+            # Parquet is detected from the data and column names are converted to uppercase
+            jobs = [(dataset_file.blob_name, {'columns': HARMONISATION.source_columns(dataset_file.dataset, year),
+                                              'dtypes': HARMONISATION.source_dtypes(dataset_file.dataset, year)})
+                    for year in stale_years for dataset_file in year_files[year]]
+            frames = iter(parallel.download_and_parse(
+                jobs,
+                download=lambda blob_name: source_container_client.get_blob_client(blob_name).download_blob().readall(),
+                parse=table_format.read_table,
+                max_concurrency=MAX_CONCURRENCY,
+                parse_pool=parse_pool,
+                stage='gold'))
+
+            for year in stale_years:
+                group_dfs[year] = build_year(year, year_files[year], frames)
+                if cache is not None and year_files[year]:
+                    with telemetry.span('gold.cache_put', year=year) as span:
+                        cache.put(year, year_fingerprints[year], group_dfs[year])
+                        span.record(rows=len(group_dfs[year]))
+            return [group_dfs[year] for year in group]
+
+        if BUILD_MODE == 'spill':
+            # One year at a time: each year's frame is dropped once it is on local disk
+            spilled = partitions.SpilledFrame(SPILL_DIR, batch_rows=SPLIT_CHUNK_ROWS)
+            for year in years:
+                for year_df in year_frames([year]):
+                    with telemetry.span('gold.spill', year=year) as span:
+                        span.record(rows=len(year_df), bytes=spilled.append(year_df))
+                    del year_df
+                    telemetry.memory_snapshot(f'gold year {year}')
+            final_df = spilled
+            logging.info(f"GoldLevel frame: {len(spilled)} rows x {len(spilled.columns)} columns, "
+                         f"{spilled.bytes_written / 2**20:.1f} MiB spilled to {SPILL_DIR}")
+        else:
+            # Add the year-specific data to the final DataFrame
+            year_dfs = year_frames(years)  # One DataFrame per year, concatenated once
+            with telemetry.span('gold.concat') as span:
+                final_df = pd.concat(year_dfs, axis=0) if years else final_df
+                span.record(rows=len(final_df))
+            del year_dfs
+            telemetry.memory_snapshot('gold frame')
+            logging.info(f"GoldLevel frame: {final_df.shape[0]} rows x {final_df.shape[1]} columns, "
+                         f"{final_df.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+
+        logging.info(f"GoldLevel year cache: {cache_hits} hits, {cache_misses} misses")
 
         # Get the current timestamp for unique file names
-        current_timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        run_time = datetime.now()
+        current_timestamp = run_time.strftime('%Y-%m-%d-%H-%M-%S')
 
         # Define the names for the blobs
-        train_blob_name = f"traindata_{current_timestamp}.csv"
-        test_blob_name = f"testdata_{current_timestamp}.csv"
+        extension = table_format.FILE_EXTENSIONS[OUTPUT_FORMAT]
+        train_blob_name = f"traindata_{current_timestamp}{extension}"
+        test_blob_name = f"testdata_{current_timestamp}{extension}"
 
         # Define content settings for the blob
         content_settings = ContentSettings(content_type='application/octet-stream')
@@ -104,152 +183,301 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         train_blob_client = destination_container_client.get_blob_client(blob=train_blob_name)
         test_blob_client = destination_container_client.get_blob_client(blob=test_blob_name)
 
-
-        # Upload the train CSV data to the 'gold-level' container
-        train_blob_client.upload_blob(train_csv_bytes, overwrite=True, content_settings=content_settings)
-
-        # Upload the test CSV data to the 'gold-level' container
-        test_blob_client.upload_blob(test_csv_bytes, overwrite=True, content_settings=content_settings)
+        if SPLIT_MODE == 'random' and spilled is not None:
+            # The same rows, in the same order, gathered from the spilled years chunk by chunk
+            train_rows, test_rows = write_spilled_random_split(spilled, train_blob_client, test_blob_client,
+                                                               content_settings)
+        elif SPLIT_MODE == 'random':
+            # Split the dataframe into train and test sets
+            train_positions, test_positions = splitting.random_split(len(final_df), TEST_SIZE, SPLIT_SEED)
+            train_df, test_df = final_df.iloc[train_positions], final_df.iloc[test_positions]
+
+            if 'RIDRETH1' in train_df.columns:
+                train_df = train_df.drop(columns=['RIDRETH1'])
+
+            # Convert the train and test DataFrames to CSV or Parquet bytes and upload them
+            for output, blob_client, df in (('train', train_blob_client, train_df), ('test', test_blob_client, test_df)):
+                with telemetry.span('gold.write', output=output) as span:
+                    data = table_format.table_bytes(df, OUTPUT_FORMAT)
+                    blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
+                    span.record(rows=len(df), bytes=len(data))
+            train_rows, test_rows = len(train_df), len(test_df)
+        else:
+            # Split by SEQN hash and stream both sets into the 'gold-level' container at once
+            train_rows, test_rows = write_hash_split(final_df, train_blob_client, test_blob_client, content_settings)
+            logging.info(f"GoldLevel split: {train_rows} train rows, {test_rows} test rows")
+
+        # Point the manifest at the new pair, only now that both are in place. Its upload is what
+        # triggers TriggerMLPipeline, once for the run.
+        manifest.write(destination_container_client, run_time.strftime('%Y%m%d%H%M%S'), train_blob_name,
+                       test_blob_name, created=run_time.isoformat(), format=OUTPUT_FORMAT,
+                       train_rows=int(train_rows), test_rows=int(test_rows))
 
         # Confirm upload
         return func.HttpResponse(
             f"Train and test data processed and uploaded to gold-level container successfully. "
-            f"Train data: {train_blob_name}, Test data: {test_blob_name}.",
+            f"Train data: {train_blob_name}, Test data: {test_blob_name}. "
+            f"Year cache: {cache_hits} hits, {cache_misses} misses.",
             status_code=200
         )
 
     except Exception as e:
+        clients.reset_on_connection_error(e)
         return func.HttpResponse(f"An error occurred: {str(e)}", status_code=500)
 
-# Define your file-specific processing functions here
-
-def process_bmx_file(year,data):
-    # Apply transformations for BMX file
-    return data[['SEQN','BMXBMI','BMXLEG','BMXWAIST','BMXWT','BMXHT','BMXARMC','BMXARML']]
-
-def process_dbq_file(year,data):
-    # Apply transformations for DBQ file
-    if year in ['1999-2000', '2001-2002', '2003-2004']:
-        data = data[['SEQN','DBD090']]
-        data.rename(columns={'DBD090':'DBD895'}, inplace=True)
-        data['DBD910'] = None
-        data['DBD905'] = None
-    elif year in ['2005-2006']:
-        data = data[['SEQN','DBD091']]
-        data.rename(columns={'DBD091':'DBD895'}, inplace=True)
-        data['DBD910'] = None
-        data['DBD905'] = None
-    else:
-        data = data[['SEQN','DBD895','DBD905','DBD910']]
-    return data
-
-
-
-def process_demo_file(year,data):
-    # Apply transformations for DEMO file
-    if year in ['1999-2000', '2001-2002']:
-        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR']]
-        #adding columns FIALANG,AIALANGA ,SIALANG,MIALANG with value null
-        data['FIALANG'] = None
-        data['AIALANG'] = None
-        data['SIALANG'] = None
-        data['MIALANG'] = None
-
-    elif year in ['2003-2004','2005-2006']:
-        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
-    
-    elif year in ['2007-2008','2009-2010']:
-         data.rename(columns={'DMDBORN2':'DMDBORN'}, inplace=True)
-         data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
-   
-    elif year in ['2011-2012','2013-2014','2015-2016']:
-        #rename DMDBORN4 to DMDBORN
-        data.rename(columns={'DMDBORN4':'DMDBORN'}, inplace=True)
-        #rename AIALANGA to AIALANG
-        data.rename(columns={'AIALANGA':'AIALANG'}, inplace=True)
-        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
-    else:
-        #rename DMDBORN4 to DMDBORN
-        data.rename(columns={'DMDBORN4':'DMDBORN'}, inplace=True)
-        #rename AIALANGA to AIALANG
-        data.rename(columns={'AIALANGA':'AIALANG'}, inplace=True)
-        #rename DMDMARTZ to DMDMARTL
-        data.rename(columns={'DMDMARTZ':'DMDMARTL'}, inplace=True)
-        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
-    return data
-
-def process_ohq_file(year,data):
-    # Apply transformations for OHQ file
-    data = data[['SEQN','OHQ033']]
-    return data
-
-def process_slq_file(year,data):
-    # Apply transformations for SLQ file
-    if year in ['1999-2000', '2001-2002', '2003-2004','2015-2016','2017-2020']:        
-        data = data[['SEQN','SLD012']]
-    else: 
-        #rename SLD010H to SLD012
-        data.rename(columns={'SLD010H':'SLD012'}, inplace=True)
-        data = data[['SEQN','SLD012']]
-    return data
-
-def process_smq_file(year,data):
-    return data[['SEQN', 'SMQ020']]
-
-def process_smqfam_file(year,data):
-    if year in ['1999-2000','2001-2002','2003-2004','2005-2006','2007-2008','2009-2010','2011-2012']:
-        #rename SMD415 to SMD460
-        data.rename(columns={'SMD415':'SMD460'}, inplace=True)
-        data = data[['SEQN','SMD460']]
-    else:
-        data = data[['SEQN','SMD460']]
-    return data
-
-
-def process_smqrtu_file(year,data):
-    if year in ['2005-2006','2007-2008','2009-2010','2011-2012']:
-        #rename SMQ690D to SMQ851
-        data.rename(columns={'SMQ690D':'SMQ851'}, inplace=True)
-        #rename SMQ680 to SMDANY
-        data.rename(columns={'SMQ680':'SMDANY'}, inplace=True)
-        #duplicate SMDANY and rename this new column to SMQ681
-        data['SMQ681'] = data['SMDANY']
-        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
-    else:
-        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
-    return data
-
-def process_smqmec_file(year,data):
-    if year in ['1999-2000']:
-        #rename SMD690D to SMQ851
-        data.rename(columns={'SMD690D':'SMQ851'}, inplace=True)
-        #rename SMD680 to SMDANY
-        data.rename(columns={'SMD680':'SMDANY'}, inplace=True)
-        #duplicate SMDANY and rename this new column to SMQ681
-        data['SMQ681'] = data['SMDANY']
-        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
-    elif year in ['2001-2002','2003-2004']:
-        #rename SMD690D to SMQ851
-        data.rename(columns={'SMQ690D':'SMQ851'}, inplace=True)
-        #rename SMD680 to SMDANY
-        data.rename(columns={'SMQ680':'SMDANY'}, inplace=True)
-        #duplicate SMDANY and rename this new column to SMQ681
-        data['SMQ681'] = data['SMDANY']
-        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
-
-    return data
-
-def process_whq_file(year,data):
-    if year in ['1999-2000']:
-        #rename WHD150 to WHQ150
-        data.rename(columns={'WHD150':'WHQ150'}, inplace=True)
-        data = data[['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010']]
-    else:
-        data = data[['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010']]
-    return data
-
-def process_cot_file(year,data):
-    return data[['SEQN', 'LBXCOT']]         
+    finally:
+        if spilled is not None:
+            spilled.close()
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
+
+def build_year(year, dataset_files, frames):
+    """Harmonise one year's parsed files (the next ones from `frames`) and join them."""
+    year_frames = []  # Processed frames of this year's files, joined once below
+
+    for dataset_file in dataset_files:
+        # Harmonise the file's columns with the other cycles
+        with telemetry.span('gold.harmonise', file=dataset_file.blob_name) as span:
+            year_frames.append(dataset_file.processor(year, next(frames)))
+            span.record(rows=len(year_frames[-1]))
+
+    # Join all the files of this year on SEQN and add the Year column
+    with telemetry.span('gold.join', year=year) as span:
+        year_df = join_year_frames(year, year_frames)
+        if COMPACT_DTYPES and 'Year' in year_df:
+            year_df['Year'] = year_df['Year'].astype(year_dtype())
+        span.record(files=len(year_frames), rows=len(year_df))
+    return year_df
+
+def frame_chunks(final_df, rows):
+    """The rows of a DataFrame or partitions.SpilledFrame, `rows` at a time."""
+    if isinstance(final_df, partitions.SpilledFrame):
+        yield from final_df.chunks(rows)
+        return
+    for start in range(0, len(final_df), rows):
+        yield final_df.iloc[start:start + rows]
+
+def output_schema(final_df, columns):
+    """Parquet schema of the `columns` of final_df (a DataFrame or SpilledFrame), for a streamed output."""
+    if OUTPUT_FORMAT != table_format.PARQUET:
+        return None
+    if isinstance(final_df, partitions.SpilledFrame):
+        return table_format.parquet_schema(final_df.schema[columns], final_df.value_types)
+    return table_format.parquet_schema(final_df[columns])
+
+def write_hash_split(final_df, train_blob_client, test_blob_client, content_settings):
+    """Write the train and test rows of final_df to their blobs; return the row counts.
+
+    Rows are assigned by splitting.in_test_set on SEQN, so no shuffled copy
+    of the frame is made. Each output is formatted SPLIT_CHUNK_ROWS rows at a
+    time in its own thread and uploaded as blocks while the next chunk is
+    formatted. The train set leaves out RIDRETH1. final_df can also be a
+    SpilledFrame, which each thread reads a chunk at a time.
+    """
+    upload_concurrency = max(1, MAX_CONCURRENCY // 2)
+
+    def write(output, blob_client, test_set, drop):
+        columns = [column for column in final_df.columns if column not in drop]
+        with telemetry.span('gold.write', output=output) as span:
+            with block_upload.BlockBlobWriter(blob_client, content_settings=content_settings,
+                                              max_concurrency=upload_concurrency) as out:
+                # Every chunk is written with the types of the whole frame
+                writer = table_format.TableWriter(out, OUTPUT_FORMAT, schema=output_schema(final_df, columns))
+                for chunk in frame_chunks(final_df, SPLIT_CHUNK_ROWS):
+                    rows = splitting.in_test_set(chunk['SEQN'].to_numpy(), TEST_SIZE, SPLIT_SEED) == test_set
+                    if rows.any():
+                        writer.write(chunk.loc[rows, columns])
+                writer.close(columns=columns)
+            span.record(rows=writer.rows, bytes=out.bytes_written)
+        return writer.rows
+
+    return parallel.thread_map(lambda args: write(*args),
+                               [('train', train_blob_client, False, {'RIDRETH1'}),
+                                ('test', test_blob_client, True, set())],
+                               max_concurrency=2)
+
+def write_spilled_random_split(spilled, train_blob_client, test_blob_client, content_settings):
+    """The 'random' split of a SpilledFrame, streamed; returns the row counts.
+
+    Gives the rows the in-memory split gives, in its shuffled order: each
+    output is gathered SPLIT_CHUNK_ROWS positions at a time from the
+    memory-mapped partitions. Only the row positions of the split are held
+    in memory.
+    """
+    train_positions, test_positions = splitting.random_split(len(spilled), TEST_SIZE, SPLIT_SEED)
+    upload_concurrency = max(1, MAX_CONCURRENCY // 2)
+
+    def write(output, blob_client, positions, drop):
+        columns = [column for column in spilled.columns if column not in drop]
+        with telemetry.span('gold.write', output=output) as span:
+            with block_upload.BlockBlobWriter(blob_client, content_settings=content_settings,
+                                              max_concurrency=upload_concurrency) as out:
+                writer = table_format.TableWriter(out, OUTPUT_FORMAT, schema=output_schema(spilled, columns))
+                for chunk in spilled.take(positions, SPLIT_CHUNK_ROWS):
+                    writer.write(chunk[columns])
+                writer.close(columns=columns)
+            span.record(rows=writer.rows, bytes=out.bytes_written)
+        return writer.rows
+
+    return parallel.thread_map(lambda args: write(*args),
+                               [('train', train_blob_client, train_positions, {'RIDRETH1'}),
+                                ('test', test_blob_client, test_positions, set())],
+                               max_concurrency=2)
+
+def open_year_cache(blob_service_client):
+    if CACHE_MODE == 'container':
+        return frame_cache.BlobFrameCache(blob_service_client.get_container_client(CACHE_CONTAINER))
+    if CACHE_MODE == 'local':
+        return frame_cache.LocalFrameCache(CACHE_DIR)
+    return None
+
+def join_year_frames(year, frames):
+    """Outer-join one year's processed frames on SEQN and add a Year column.
+
+    Gives the same result as merging the frames one at a time with
+    pd.merge(on='SEQN', how='outer'), but every frame is indexed by SEQN once
+    and they are all joined in a single pass instead of copying the growing
+    year frame once per file.
+    """
+    # While nothing has been merged, a frame with no rows is replaced by the next one
+    while len(frames) > 1 and frames[0].empty:
+        frames = frames[1:]
+    if not frames:
+        return pd.DataFrame()
+
+    if len(frames) == 1:
+        return frames[0].assign(Year=year)
+
+    # pd.merge suffixes shared column names and repeats rows for duplicate or missing keys;
+    # keep its exact behaviour for those (unexpected) inputs.
+    keys = [data['SEQN'].to_numpy() for data in frames]
+    seen = set(frames[0].columns)
+    for i, (data, seqn) in enumerate(zip(frames, keys)):
+        other_columns = set(data.columns) - {'SEQN'}
+        if (i and other_columns & seen) or not _unique_keys(seqn):
+            return _merge_year_frames(year, frames)
+        seen |= other_columns
+
+    # Every SEQN of the year, sorted as an outer merge sorts them
+    all_keys = np.unique(np.concatenate(keys))
+    columns = {}
+    for data, seqn in zip(frames, keys):
+        # Row of this frame for each SEQN of the year, -1 where the participant has no row
+        indexer = np.full(len(all_keys), -1, dtype=np.intp)
+        indexer[np.searchsorted(all_keys, seqn)] = np.arange(len(seqn))
+        for column in data.columns:
+            if column == 'SEQN':
+                columns.setdefault('SEQN', all_keys)
+            else:
+                # Fills missing rows with NaN, upcasting the dtype only when needed, as merge does
+                columns[column] = pd.api.extensions.take(data[column].array, indexer, allow_fill=True)
+        # The Year column follows the first file's columns, as it did when added after the first merge
+        columns.setdefault('Year', None)
+    year_df = pd.DataFrame(columns)
+    year_df['Year'] = year
+    return year_df
+
+def _unique_keys(seqn):
+    if len(seqn) and np.isnan(seqn.astype(float, copy=False)).any():
+        return False
+    # NHANES files are sorted by SEQN, which makes this a cheap check
+    if (np.diff(seqn) > 0).all():
+        return True
+    return pd.Index(seqn).is_unique
+
+def _merge_year_frames(year, frames):
+    year_df = pd.DataFrame()
+    for data in frames:
+        if year_df.empty:
+            year_df = data
+        else:
+            year_df = pd.merge(year_df, data, on='SEQN', how='outer')
+        year_df['Year'] = year
+    return year_df
+
+# How each dataset's columns are harmonised across the cycles: the output columns (named as in the
+# later cycles), the source columns renamed to get them, and columns added as a copy of another
+# column or as nulls. A rule without years covers the cycles no other rule of the dataset lists.
+# Only the source columns of a file's rule are loaded from silver-level.
+DEMO_COLUMNS = ['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR',
+                'FIALANG','AIALANG','SIALANG','MIALANG']
+SMOKING_COLUMNS = ['SEQN','SMQ851','SMDANY']
+
+# Dtype of every output column: nullable small integers for coded answers and counts (which
+# include the 7.../9... refused and don't-know codes), float32 for measurements. Applied when the
+# files are read and kept through the joins, the split and Parquet outputs.
+COLUMN_DTYPES = {
+    'SEQN': 'int32',
+    'BMXBMI': 'float32', 'BMXLEG': 'float32', 'BMXWAIST': 'float32', 'BMXWT': 'float32',
+    'BMXHT': 'float32', 'BMXARMC': 'float32', 'BMXARML': 'float32',
+    'DBD895': 'Int16', 'DBD905': 'Int16', 'DBD910': 'Int16',
+    'RIAGENDR': 'Int8', 'RIDAGEYR': 'Int8', 'RIDEXMON': 'Int8', 'RIDRETH1': 'Int8', 'DMDBORN': 'Int8',
+    'DMDEDUC2': 'Int8', 'DMDMARTL': 'Int8', 'INDFMPIR': 'float32',
+    'FIALANG': 'Int8', 'AIALANG': 'Int8', 'SIALANG': 'Int8', 'MIALANG': 'Int8',
+    'OHQ033': 'Int8',
+    'SLD012': 'float32',
+    'SMQ020': 'Int8',
+    'SMD460': 'Int16',
+    'SMQ851': 'Int8', 'SMDANY': 'Int8', 'SMQ681': 'Int8',
+    'WHQ150': 'Int32', 'WHD140': 'Int16', 'WHD050': 'Int16', 'WHD020': 'Int16', 'WHD010': 'Int16',
+    'LBXCOT': 'float32',
+}
+@functools.cache
+def year_dtype():
+    # Every cycle is a category, so the years concatenate without falling back to strings
+    return pd.CategoricalDtype(datasets.YEARS)
+
+HARMONISATION = harmonisation.Harmonisation([
+    Rule('BMX', None, ['SEQN','BMXBMI','BMXLEG','BMXWAIST','BMXWT','BMXHT','BMXARMC','BMXARML']),
+
+    Rule('DBQ', cycles('1999-2000', '2003-2004'), ['SEQN','DBD895'],
+         renames={'DBD090':'DBD895'}, add={'DBD910': None, 'DBD905': None}),
+    Rule('DBQ', ['2005-2006'], ['SEQN','DBD895'],
+         renames={'DBD091':'DBD895'}, add={'DBD910': None, 'DBD905': None}),
+    Rule('DBQ', None, ['SEQN','DBD895','DBD905','DBD910']),
+
+    # The language columns were only added in 2003-2004
+    Rule('DEMO', cycles('1999-2000', '2001-2002'), DEMO_COLUMNS[:9],
+         add={'FIALANG': None, 'AIALANG': None, 'SIALANG': None, 'MIALANG': None}),
+    Rule('DEMO', cycles('2003-2004', '2005-2006'), DEMO_COLUMNS),
+    Rule('DEMO', cycles('2007-2008', '2009-2010'), DEMO_COLUMNS, renames={'DMDBORN2':'DMDBORN'}),
+    Rule('DEMO', cycles('2011-2012', '2015-2016'), DEMO_COLUMNS,
+         renames={'DMDBORN4':'DMDBORN', 'AIALANGA':'AIALANG'}),
+    Rule('DEMO', None, DEMO_COLUMNS, renames={'DMDBORN4':'DMDBORN', 'AIALANGA':'AIALANG', 'DMDMARTZ':'DMDMARTL'}),
+
+    Rule('OHQ', None, ['SEQN','OHQ033']),
+
+    Rule('SLQ', cycles('2005-2006', '2013-2014'), ['SEQN','SLD012'], renames={'SLD010H':'SLD012'}),
+    Rule('SLQ', None, ['SEQN','SLD012']),
+
+    Rule('SMQ', None, ['SEQN','SMQ020']),
+
+    Rule('SMQFAM', cycles('1999-2000', '2011-2012'), ['SEQN','SMD460'], renames={'SMD415':'SMD460'}),
+    Rule('SMQFAM', None, ['SEQN','SMD460']),
+
+    # Before 2013-2014 the "any tobacco" question is both SMDANY and SMQ681
+    Rule('SMQRTU', cycles('2005-2006', '2011-2012'), SMOKING_COLUMNS,
+         renames={'SMQ690D':'SMQ851', 'SMQ680':'SMDANY'}, add={'SMQ681': 'SMDANY'}),
+    Rule('SMQRTU', None, SMOKING_COLUMNS + ['SMQ681']),
+
+    Rule('SMQMEC', ['1999-2000'], SMOKING_COLUMNS,
+         renames={'SMD690D':'SMQ851', 'SMD680':'SMDANY'}, add={'SMQ681': 'SMDANY'}),
+    Rule('SMQMEC', cycles('2001-2002', '2003-2004'), SMOKING_COLUMNS,
+         renames={'SMQ690D':'SMQ851', 'SMQ680':'SMDANY'}, add={'SMQ681': 'SMDANY'}),
+    # Later cycles moved these questions to SMQRTU; any other SMQMEC file is kept as it is
+    Rule('SMQMEC', None, None),
+
+    Rule('WHQ', ['1999-2000'], ['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010'], renames={'WHD150':'WHQ150'}),
+    Rule('WHQ', None, ['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010']),
+
+    Rule('COT', None, ['SEQN','LBXCOT']),
+], dtypes=COLUMN_DTYPES if COMPACT_DTYPES else None)
+
+# Mapping of dataset codes to their harmonisation, built once at import. Classifies the
+# silver-level blob names the same way SilverLevel selects the bronze-level ones.
+CATALOG = datasets.DatasetCatalog({
+    dataset: functools.partial(HARMONISATION.apply, dataset) for dataset in HARMONISATION.datasets
+})
 
 
 
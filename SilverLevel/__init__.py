@@ -44,46 +44,65 @@
 
 
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
 import os
 import json
-import re
+import logging
 
+from shared_code import clients, datasets, parallel, promotion, telemetry
+
+# Copies started and listings run at once
+MAX_CONCURRENCY = parallel.setting('SILVER_MAX_CONCURRENCY', 16)
+# How long to wait for asynchronous (pending) copies; a rerun picks up the ones still pending
+COPY_TIMEOUT_SECONDS = parallel.setting('SILVER_COPY_TIMEOUT_SECONDS', 60)
+COPY_POLL_SECONDS = parallel.setting('SILVER_COPY_POLL_SECONDS', 2)
+# Recognises the files of the datasets the pipeline uses, e.g. 2003-2004/DEMO_C.csv
+CATALOG = datasets.DatasetCatalog()
+
+@telemetry.instrument('SilverLevel')
 def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         req_body = req.get_json() if req.get_body() else {}
-        # Log the body for informational purposes. In production, you might want to remove this.
-        print(f"Received body: {json.dumps(req_body)}")
+        # The body only holds options; it is not written to the function's output
+        logging.debug(f"Received body: {json.dumps(req_body)}")
         # Set up connection string and client
         connection_string = os.environ['AzureWebJobsStorage']  # Get connection string from environment variable
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        # Reused across invocations of this worker, with its connection pool
+        blob_service_client = clients.blob_service_client(connection_string)
 
         # Define the container names
         source_container_name = 'bronze-level'
         target_container_name = 'silver-level'
 
-        # Define the patterns to look for in the file names
-        patterns = re.compile(r'\b(?:BMX|DBQ|DEMO|COT|OHQ|SLQ|SMQ|SMQFAM|SMQMEC|WHQ|SLQ|SMQRTU)\b')
-
         # List the blobs in the source container
         source_container_client = blob_service_client.get_container_client(source_container_name)
         target_container_client = blob_service_client.get_container_client(target_container_name)
 
-        # Go through the blobs in the source container
-        for blob in source_container_client.list_blobs():
-            # Check if the blob name contains any of the patterns
-            if patterns.search(blob.name):
-                # Copy the blob to the target container while maintaining the hierarchy
-                source_blob = source_container_client.get_blob_client(blob)
-                target_blob = target_container_client.get_blob_client(blob.name)
-
-                # Start the copy operation
-                copy_status = target_blob.start_copy_from_url(source_blob.url)
-                if copy_status['copy_status'] != 'success':
-                    # Handle the unsuccessful copy
-                    return func.HttpResponse(f"Failed to copy blob {blob.name}", status_code=500)
-
-        return func.HttpResponse("Files have been copied to the silver-level container.", status_code=200)
+        # Copy the blobs of the pipeline's datasets, keeping the hierarchy. Both containers
+        # are listed per year folder, blobs already copied from the same source version are skipped,
+        # and the copies run concurrently on the storage service. {"prefixes": ["2017-2020/"]} in the
+        # request body limits the run to those folders
+        with telemetry.span('silver.promote') as span:
+            result = promotion.promote(
+                source_container_client, target_container_client,
+                select=lambda name: CATALOG.classify(name) is not None,
+                prefixes=req_body.get('prefixes'),
+                max_concurrency=MAX_CONCURRENCY,
+                timeout=COPY_TIMEOUT_SECONDS,
+                poll_interval=COPY_POLL_SECONDS)
+            span.record(copied=result[promotion.COPIED], skipped=result[promotion.SKIPPED],
+                        pending=result[promotion.PENDING], failed=len(result[promotion.FAILED]))
+
+        summary = (f"{result[promotion.COPIED]} copied, {result[promotion.SKIPPED]} skipped (already current), "
+                   f"{result[promotion.PENDING]} pending, {len(result[promotion.FAILED])} failed "
+                   f"in {result['seconds']:.1f}s")
+        logging.info(f"SilverLevel promotion: {summary}")
+        if result[promotion.FAILED]:
+            # Handle the unsuccessful copies
+            failed = ', '.join(result[promotion.FAILED][:10])
+            return func.HttpResponse(f"Failed to copy blobs {failed}. {summary}.", status_code=500)
+
+        return func.HttpResponse(f"Files have been copied to the silver-level container: {summary}.", status_code=200)
 
     except Exception as e:
+        clients.reset_on_connection_error(e)
         return func.HttpResponse(f"An error occurred: {e}", status_code=500)
\ No newline at end of file
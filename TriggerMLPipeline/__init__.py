@@ -1,12 +1,10 @@
 import logging
 import azure.functions as func
-from azure.ai.ml import MLClient
-from azure.ai.ml.constants import AssetTypes
-from azure.ai.ml.entities import Data
-from azure.storage.blob import BlobServiceClient
 import os
-from azure.identity import DefaultAzureCredential
 
+from shared_code import clients, manifest, telemetry
+
+@telemetry.instrument('TriggerMLPipeline')
 def main(myblob: func.InputStream):
     # Set environment variables beforehand in the Function App settings
     subscription_id = os.environ["AZURE_SUBSCRIPTION_ID"]
@@ -15,50 +13,64 @@ def main(myblob: func.InputStream):
     connection_string = os.environ['AzureWebJobsStorage']
     container_name = 'gold-level'
     datastore_name = 'traintestdata'
-    
-    # Create MLClient using DefaultAzureCredential
-    credential = DefaultAzureCredential()
-    ml_client = MLClient(credential, subscription_id, resource_group, workspace_name)
-    
-    # Create a blob service client to retrieve files from the blob container
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    container_client = blob_service_client.get_container_client(container_name)
 
-    # List all blobs in the container with 'train' prefix
-    train_blobs = list(container_client.list_blobs(name_starts_with='train', include=['metadata']))
-    test_blobs = list(container_client.list_blobs(name_starts_with='test', include=['metadata']))
+    # Only the gold-level manifest triggers this function (see function.json). GoldLevel writes it
+    # once per run, after both files, and it names that run's train and test blobs, so there is no
+    # need to list the container for the most recent ones
+    if myblob.name.split('/', 1)[-1] != manifest.MANIFEST_BLOB:
+        logging.info(f"Ignoring {myblob.name}: not the gold-level manifest.")
+        return
+    latest = manifest.parse(myblob.read())
+    run_id = latest['run_id']
+    train_blob_name = latest['train']
+    test_blob_name = latest['test']
+
+    logging.info(f"Most recent training file: {train_blob_name}")
+    logging.info(f"Most recent test file: {test_blob_name}")
+
+    # Create a blob service client to record the registration in the container
+    blob_service_client = clients.blob_service_client(connection_string)
+    container_client = blob_service_client.get_container_client(container_name)
 
-    if not train_blobs or not test_blobs:
-        logging.info("Could not find both training and test data in the gold-level container.")
+    # A blob trigger can fire more than once for the same write; only the first invocation for a run
+    # registers its data assets
+    if not manifest.claim(container_client, run_id):
+        logging.info(f"Data assets for GoldLevel run {run_id} are already registered.")
         return
 
-    # Get the most recent train and test blobs
-    most_recent_train_blob = max(train_blobs, key=lambda x: x.metadata['last_modified'])
-    most_recent_test_blob = max(test_blobs, key=lambda x: x.metadata['last_modified'])
+    try:
+        with telemetry.span('trigger.import'):
+            # azure.ai.ml takes seconds to import, so only invocations that register data load it
+            from azure.ai.ml.constants import AssetTypes
+            from azure.ai.ml.entities import Data
 
-    train_blob_name = most_recent_train_blob.name
-    test_blob_name = most_recent_test_blob.name
+        # MLClient using DefaultAzureCredential; both are created once per worker, so warm
+        # invocations reuse the cached token and connections
+        ml_client = clients.ml_client(subscription_id, resource_group, workspace_name)
 
-    logging.info(f"Most recent training file: {train_blob_name}")
-    logging.info(f"Most recent test file: {test_blob_name}")
+        # Register the training data asset
+        train_data_asset = Data(
+            path=f"azureml://datastores/{datastore_name}/paths/{train_blob_name}",
+            type=AssetTypes.MLTABLE,
+            name=f"training_data_{run_id}",
+            description="New training data version registered by Azure Function."
+        )
+        with telemetry.span('trigger.register', asset=train_data_asset.name):
+            train_data_asset = ml_client.data.create_or_update(train_data_asset)
 
-    # Register the training data asset
-    train_data_asset = Data(
-        path=f"azureml://datastores/{datastore_name}/paths/{train_blob_name}",
-        type=AssetTypes.MLTABLE,
-        name=f"training_data_{most_recent_train_blob.metadata['last_modified'].strftime('%Y%m%d%H%M%S')}",
-        description="New training data version registered by Azure Function."
-    )
-    train_data_asset = ml_client.data.create_or_update(train_data_asset)
-    
-    # Register the test data asset
-    test_data_asset = Data(
-        path=f"azureml://datastores/{datastore_name}/paths/{test_blob_name}",
-        type=AssetTypes.MLTABLE,
-        name=f"testing_data_{most_recent_test_blob.metadata['last_modified'].strftime('%Y%m%d%H%M%S')}",
-        description="New testing data version registered by Azure Function."
-    )
-    test_data_asset = ml_client.data.create_or_update(test_data_asset)
+        # Register the test data asset
+        test_data_asset = Data(
+            path=f"azureml://datastores/{datastore_name}/paths/{test_blob_name}",
+            type=AssetTypes.MLTABLE,
+            name=f"testing_data_{run_id}",
+            description="New testing data version registered by Azure Function."
+        )
+        with telemetry.span('trigger.register', asset=test_data_asset.name):
+            test_data_asset = ml_client.data.create_or_update(test_data_asset)
+    except Exception:
+        # Let a retry of the trigger register the run
+        manifest.release(container_client, run_id)
+        raise
 
     logging.info(f"Registered new training data asset: {train_data_asset.name}")
     logging.info(f"Registered new testing data asset: {test_data_asset.name}")
\ No newline at end of file
@@ -0,0 +1,54 @@
+import azure.functions as func
+import os
+import json
+import logging
+import time
+
+from shared_code import clients, parallel, telemetry, xpt_conversion
+
+INPUT_CONTAINER = 'input-data-files'
+# Conversions run at once, each in its own process (0 converts in the download threads)
+PROCESSES = parallel.setting('XPT_BATCH_PROCESSES', os.cpu_count() or 1)
+# Downloads and uploads run at once
+MAX_CONCURRENCY = parallel.setting('XPT_BATCH_MAX_CONCURRENCY', parallel.DEFAULT_MAX_CONCURRENCY)
+
+@telemetry.instrument('XPTBatchConversion')
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    # Converts many XPT files of the input container in one call, e.g. to back-fill a release:
+    # {"prefix": "2017-2020/"} converts every .XPT blob under the prefix, {"blobs": ["2017-2020/DEMO_J.XPT"]}
+    # the listed ones. The outputs are the same as the XPTtoCSVconversion trigger's.
+    try:
+        req_body = req.get_json() if req.get_body() else {}
+        connection_string = os.environ['AzureWebJobsStorage']
+        blob_service_client = clients.blob_service_client(connection_string)
+        input_container_client = blob_service_client.get_container_client(INPUT_CONTAINER)
+
+        # Create the output container once for the whole batch
+        xpt_conversion.get_or_create_container(blob_service_client, xpt_conversion.OUTPUT_CONTAINER)
+        output_container_client = blob_service_client.get_container_client(xpt_conversion.OUTPUT_CONTAINER)
+
+        blob_names = req_body.get('blobs')
+        if blob_names is None:
+            blob_names = [blob.name for blob in input_container_client.list_blobs(name_starts_with=req_body.get('prefix'))
+                          if blob.name.lower().endswith('.xpt')]
+        if not blob_names:
+            return func.HttpResponse("No XPT files to convert.", status_code=200)
+
+        start = time.perf_counter()
+        results = xpt_conversion.convert_blobs(input_container_client, output_container_client, blob_names,
+                                               processes=min(PROCESSES, len(blob_names)),
+                                               max_concurrency=MAX_CONCURRENCY)
+        seconds = time.perf_counter() - start
+
+        failed = [result['blob'] for result in results if 'error' in result]
+        rows = sum(result.get('rows', 0) for result in results)
+        logging.info(f"XPTBatchConversion: {len(results) - len(failed)} converted, {len(failed)} failed, "
+                     f"{rows} rows in {seconds:.1f}s")
+        body = {'converted': len(results) - len(failed), 'failed': failed, 'rows': rows, 'seconds': seconds,
+                'files': results}
+        return func.HttpResponse(json.dumps(body, indent=1), mimetype='application/json',
+                                 status_code=500 if failed else 200)
+
+    except Exception as e:
+        clients.reset_on_connection_error(e)
+        return func.HttpResponse(f"An error occurred: {e}", status_code=500)
\ No newline at end of file
@@ -1,66 +1,45 @@
 import logging
 import os
-import io
-import pandas as pd
-from azure.storage.blob import BlobServiceClient
-import azure.functions 
+import azure.functions
 
-def get_or_create_container(blob_service_client, container_name):
-    container_client = blob_service_client.get_container_client(container_name)
-    try:
-        container_client.create_container()
-        logging.info(f"Container '{container_name}' created.")
-    except Exception as e:
-        if not e.error_code == 'ContainerAlreadyExists':
-            raise
+from shared_code import clients, telemetry, xpt_conversion
+from shared_code.xpt_conversion import CONVERSION_MODE, OUTPUT_FORMAT
 
+@telemetry.instrument('XPTtoCSVconversion')
 def main(myblob: azure.functions.InputStream):
     try:
         # Assuming 'myblob' includes the path to the .XPT file in the input container
         blob_path = myblob.name
-        blob_dir, blob_filename = os.path.split(blob_path)
-        base_filename = os.path.splitext(blob_filename)[0]
-        csv_filename = f"{base_filename}.csv"`
-
-        # Read the XPT file into a bytes-like object
-        xpt_data = myblob.read()
-
-        # Use a BytesIO stream to load into pandas
-        df = pd.read_sas(io.BytesIO(xpt_data), format='xport')
 
-        # Convert the DataFrame to CSV format
-        csv_data = df.to_csv(index=False)
-
-        # Encode the CSV data to bytes
-        csv_bytes = csv_data.encode('utf-8')
-
-        # Get the blob service client to upload the CSV
+        # Get the blob service client to upload the output (reused across invocations of this worker)
         connection_string = os.getenv('AzureWebJobsStorage')
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        blob_service_client = clients.blob_service_client(connection_string)
 
         # Define the output container name
-        output_container_name = 'bronze-level'
+        output_container_name = xpt_conversion.OUTPUT_CONTAINER
 
         # Create the container if it does not exist
-        get_or_create_container(blob_service_client, output_container_name)
-
-        # Split the path into parts
-        path_parts = blob_path.split('/')
+        xpt_conversion.get_or_create_container(blob_service_client, output_container_name)
 
-        # Extract the year portion, which we are assuming to be the second part of the path
-        year_folder = path_parts[1]
+        # Construct the new output path to store the file directly in the year folder of the output
+        # container (the path after the input container name starts with the year)
+        output_blob_path = xpt_conversion.output_blob_path(blob_path.split('/', 1)[1])
 
-        # Construct the new output path to store the file directly in the year folder of the output container
-        output_blob_path = f"{year_folder}/{csv_filename}"
+        # Get the blob client to upload the converted data
+        blob_client = blob_service_client.get_blob_client(container=output_container_name, blob=output_blob_path)
 
-        # Get the blob client to upload the CSV data
-        blob_client = blob_service_client.get_blob_client(output_blob_path)
+        # Converting and uploading overlap, so both are one span
+        with telemetry.span('xpt.convert', file=blob_path, mode=CONVERSION_MODE) as span:
+            if CONVERSION_MODE == 'buffered':
+                rows = xpt_conversion.convert_xpt_buffered(myblob.read(), blob_client)
+            else:
+                with xpt_conversion.spool_input(myblob) as xpt_file:
+                    rows = xpt_conversion.convert_xpt_streaming(xpt_file, blob_client)
+            span.record(rows=rows)
 
-        # Upload the CSV data to the output blob
-        blob_client.upload_blob(csv_bytes, blob_type="BlockBlob", overwrite=True)
+        logging.info(f"{OUTPUT_FORMAT.upper()} file uploaded to blob storage: {output_blob_path} ({rows} rows)")
 
-        logging.info(f"CSV file uploaded to blob storage: {output_blob_path}")
-        
     except Exception as e:
+        clients.reset_on_connection_error(e)
         logging.error(f"Error processing blob: {myblob.name}")
         logging.error(e)
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""Warm invocation latency with per-invocation clients vs the cached shared_code.clients.
+
+Runs SilverLevel.main repeatedly in one process (a warm worker) against a
+local HTTPS blob endpoint with a self-signed certificate. The endpoint only
+answers listings (empty ones), and each request waits `--rtt-ms` and each new
+connection a further two round trips (TCP + TLS handshakes), like a storage
+account a few milliseconds away. 'per-invocation' drops the cached clients
+before every call, which is what constructing BlobServiceClient in main()
+did; 'cached' keeps them. Prints p50/p99 latency and the TLS connections
+opened.
+
+Only the storage client is measured: DefaultAzureCredential and MLClient
+need a real tenant. Caching them saves their credential discovery and token
+requests in the same way.
+
+    python benchmarks/bench_client_reuse.py --invocations 200 --rtt-ms 5
+"""
+import argparse
+import contextlib
+import datetime
+import http.server
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EMPTY_LISTING = (b'<?xml version="1.0" encoding="utf-8"?>'
+                 b'<EnumerationResults ServiceEndpoint="https://127.0.0.1/">'
+                 b'<Blobs /><NextMarker /></EnumerationResults>')
+
+
+def self_signed_certificate(directory):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+                   .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]),
+                                  critical=False)
+                   .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class BlobEndpoint(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; without this, delayed ACKs add 40 ms per request
+    disable_nagle_algorithm = True
+    rtt = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with BlobEndpoint.lock:
+            BlobEndpoint.connections += 1
+        self.connection.do_handshake()
+        # TCP and TLS 1.3 handshakes: one round trip each
+        time.sleep(2 * self.rtt)
+
+    def do_GET(self):
+        time.sleep(self.rtt)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(EMPTY_LISTING)))
+        self.send_header('x-ms-version', '2025-01-05')
+        self.end_headers()
+        self.wfile.write(EMPTY_LISTING)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_endpoint(cert_path, key_path, rtt):
+    BlobEndpoint.rtt = rtt
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), BlobEndpoint)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    # The handshake runs in the handler thread, not in accept()
+    server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invocations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--rtt-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_certificate(directory)
+        # requests picks this up for the SDK's certificate verification
+        os.environ['REQUESTS_CA_BUNDLE'] = cert_path
+        server = start_endpoint(cert_path, key_path, args.rtt_ms / 1000)
+        account_key = 'A' * 86 + '=='
+        os.environ['AzureWebJobsStorage'] = (
+            f"DefaultEndpointsProtocol=https;AccountName=bench;AccountKey={account_key};"
+            f"BlobEndpoint=https://127.0.0.1:{server.server_address[1]}/bench;")
+
+        import logging
+        import azure.functions as func
+        import SilverLevel
+        from shared_code import clients
+
+        logging.disable(logging.CRITICAL)
+        request = func.HttpRequest(method='POST', url='/api/SilverLevel', body=b'')
+        print(f"{args.invocations} warm SilverLevel invocations, {args.rtt_ms:g} ms round trip")
+        for mode in ('per-invocation', 'cached'):
+            clients.reset()
+            latencies = []
+            for i in range(args.warmup + args.invocations):
+                if mode == 'per-invocation':
+                    clients.reset()
+                if i == args.warmup:
+                    BlobEndpoint.connections = 0
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(None):
+                    response = SilverLevel.main(request)
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise RuntimeError(response.get_body().decode())
+                if i >= args.warmup:
+                    latencies.append(elapsed * 1000)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{mode:>15}: p50 {p50:6.1f} ms, p99 {p99:6.1f} ms, "
+                  f"{BlobEndpoint.connections} TLS connections opened")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
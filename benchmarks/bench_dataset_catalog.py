@@ -0,0 +1,105 @@
+"""Blob name classification: the original SilverLevel/GoldLevel matching vs DatasetCatalog.
+
+Classifies a synthetic listing of `--names` blob names (pipeline datasets
+with and without cycle suffixes, other NHANES files, odd extensions and
+casing) with:
+
+- SilverLevel's original `\\b(...)\\b` regex search;
+- GoldLevel's original split-and-membership test, including the
+  processing-function dict it rebuilt for every blob;
+- DatasetCatalog.classify.
+
+and prints the time per name and the names the original rules disagree on.
+
+    python benchmarks/bench_dataset_catalog.py --names 100000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nhanes_fixtures import SUFFIXES, YEARS  # noqa: E402
+from shared_code import datasets  # noqa: E402
+
+OTHER_FILES = ['PAXRAW', 'L13', 'BPX', 'DEMOGRAPHICS', 'SMQ_FAM', 'P_DEMO', 'README', 'ALQ', 'WHQMEC']
+EXTENSIONS = ['.csv', '.parquet', '.xpt', '.XPT', '']
+
+SILVER_PATTERN = re.compile(r'\b(?:BMX|DBQ|DEMO|COT|OHQ|SLQ|SMQ|SMQFAM|SMQMEC|WHQ|SLQ|SMQRTU)\b')
+GOLD_PATTERNS = ['BMX', 'DBQ', 'DEMO', 'OHQ', 'SLQ', 'SMQ', 'SMQFAM', 'SMQRTU', 'SMQMEC', 'WHQ', 'COT']
+
+
+def synthetic_listing(count, seed=0):
+    rng = np.random.default_rng(seed)
+    files = list(datasets.DATASETS) * 3 + OTHER_FILES
+    names = []
+    for n in range(count):
+        year = YEARS[rng.integers(len(YEARS))]
+        file_name = files[rng.integers(len(files))]
+        if rng.random() < 0.8:
+            file_name += SUFFIXES[year]
+        if rng.random() < 0.1:
+            file_name = file_name.lower()
+        names.append(f"{year}/{file_name}{EXTENSIONS[rng.integers(len(EXTENSIONS))]}")
+    return names
+
+
+def silver_original(name):
+    return SILVER_PATTERN.search(name) is not None
+
+
+def gold_original(name):
+    file_name = name.split('/')[1].upper()
+    if '_' in file_name:
+        clean_file_name = file_name.split('_')[0]
+    else:
+        clean_file_name = file_name.split('.')[0]
+    if clean_file_name not in GOLD_PATTERNS:
+        return None
+    processors = {pattern: len for pattern in GOLD_PATTERNS}
+    return clean_file_name, processors[clean_file_name]
+
+
+def timed(function, names, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(name) for name in names]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=100_000)
+    args = parser.parse_args()
+
+    names = synthetic_listing(args.names)
+    catalog = datasets.DatasetCatalog(dict.fromkeys(datasets.DATASETS, len))
+
+    silver_time, silver = timed(silver_original, names)
+    gold_time, gold = timed(gold_original, names)
+    catalog_time, classified = timed(catalog.classify, names)
+
+    print(f"{len(names)} names")
+    for label, elapsed, selected in [('silver regex', silver_time, silver),
+                                     ('gold split', gold_time, [r is not None for r in gold]),
+                                     ('catalog', catalog_time, [r is not None for r in classified])]:
+        print(f"{label:>13}: {elapsed * 1e9 / len(names):6.0f} ns/name, {sum(selected)} selected")
+
+    # GoldLevel's rule is the one the catalog keeps
+    assert [r and r[0] for r in gold] == [r and r.dataset for r in classified]
+    disagreements = sorted({name.split('/', 1)[1] for name, s, c in zip(names, silver, classified)
+                            if s != (c is not None)})
+    print(f"silver regex and catalog disagree on {len(disagreements)} distinct file names, e.g. "
+          f"{', '.join(disagreements[:8])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""GoldLevel reruns with the per-year cache: cold, unchanged, one file changed.
+
+Each rerun should only download and rebuild the years whose source files
+changed; the rest come from the cache. All runs must produce the same
+train/test data.
+
+    python benchmarks/bench_gold_cache.py --cache container --latency 0.03
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+from fake_storage import FakeBlobStore  # noqa: E402
+from nhanes_fixtures import load_silver_layer  # noqa: E402
+from bench_gold_parallel import gold_outputs, run_gold  # noqa: E402
+from shared_code import table_format  # noqa: E402
+import GoldLevel  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=5000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=20)
+    parser.add_argument('--format', choices=sorted(table_format.FILE_EXTENSIONS), default='csv')
+    parser.add_argument('--cache', choices=['container', 'local'], default='container')
+    parser.add_argument('--latency', type=float, default=0.03, help="seconds per storage request")
+    parser.add_argument('--bandwidth', type=float, default=50, help="MB/s per request")
+    args = parser.parse_args()
+
+    store = FakeBlobStore(latency=args.latency, bandwidth=args.bandwidth * 1e6)
+    load_silver_layer(store, args.format, participants=args.participants, filler_columns=args.filler_columns)
+    GoldLevel.CACHE_MODE = args.cache
+    GoldLevel.CACHE_DIR = tempfile.mkdtemp(prefix='gold-cache-')
+
+    def touch_one_file():
+        # Re-upload one file of one cycle: same content, new ETag
+        name = store.names('silver-level', '2009-2010/')[0]
+        store.put('silver-level', name, store.get('silver-level', name))
+
+    baseline = None
+    for label, before in [('cold', None), ('unchanged', None), ('one file changed', touch_one_file)]:
+        if before is not None:
+            before()
+        store.containers.pop('gold-level', None)
+        store.reset_stats()
+        elapsed = run_gold(store)
+        outputs = gold_outputs(store)
+        if baseline is None:
+            baseline = outputs
+        else:
+            for expected, actual in zip(baseline, outputs):
+                assert expected.equals(actual), "cached run differs from the cold run"
+        print(f"{label:>17}: {elapsed:.2f}s, {store.requests} requests, "
+              f"{store.bytes_downloaded / 2**20:.1f} MiB downloaded")
+
+
+if __name__ == '__main__':
+    main()
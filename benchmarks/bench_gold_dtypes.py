@@ -0,0 +1,104 @@
+"""GoldLevel memory with the compact column dtypes vs the original float64/object columns.
+
+Each setting of GOLD_COMPACT_DTYPES runs in its own subprocess against the
+synthetic silver layer in an in-process blob store. Reports the size of the
+full 1999-2020 frame GoldLevel builds (memory_usage(deep=True)), the peak
+RSS of the run over the loaded store, the output size and the time, and
+the signed change of each with the compact dtypes.
+
+    python benchmarks/bench_gold_dtypes.py --participants 10000 --format parquet
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+from bench_xpt_conversion import _current_rss_kib, _peak_rss_kib, _reset_peak_rss  # noqa: E402
+
+
+class FrameSizeHandler(logging.Handler):
+    """Keeps GoldLevel's log line with the size of the full frame."""
+
+    def __init__(self):
+        super().__init__()
+        self.message = None
+
+    def emit(self, record):
+        message = record.getMessage()
+        if message.startswith('GoldLevel frame:'):
+            self.message = message
+
+
+def run_worker(participants, silver_format, output_format):
+    import azure.functions as func
+    from fake_storage import FakeBlobStore
+    from nhanes_fixtures import load_silver_layer
+    import GoldLevel
+
+    GoldLevel.OUTPUT_FORMAT = output_format
+    store = FakeBlobStore()
+    load_silver_layer(store, silver_format, participants=participants)
+    handler = FrameSizeHandler()
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
+    _reset_peak_rss()
+    baseline = _current_rss_kib()
+
+    start = time.perf_counter()
+    with store.patch(GoldLevel):
+        response = GoldLevel.main(func.HttpRequest(method='POST', url='/api/GoldLevel', body=b''))
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode())
+
+    frame_mib = float(handler.message.rsplit(',', 1)[1].split()[0])
+    print(json.dumps({
+        'seconds': elapsed,
+        'frame_mib': frame_mib,
+        'peak_rss_mib': (_peak_rss_kib() - baseline) / 1024,
+        'output_mib': sum(len(store.get('gold-level', name)) for name in store.names('gold-level')) / 2**20,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=10000, help="participants per cycle")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="silver-level format")
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], default='parquet')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.participants, args.format, args.output_format)
+        return
+
+    print(f"{args.participants} participants per cycle, {args.format} silver layer, {args.output_format} outputs")
+    results = {}
+    for compact in ('false', 'true'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--participants', str(args.participants),
+             '--format', args.format, '--output-format', args.output_format],
+            env={**os.environ, 'GOLD_COMPACT_DTYPES': compact},
+            check=True, capture_output=True, text=True).stdout
+        results[compact] = result = json.loads(output.strip().splitlines()[-1])
+        label = 'compact' if compact == 'true' else 'original'
+        print(f"{label:>9}: frame {result['frame_mib']:6.1f} MiB, peak RSS +{result['peak_rss_mib']:6.1f} MiB, "
+              f"outputs {result['output_mib']:5.1f} MiB, {result['seconds']:.2f}s")
+
+    def change(key):
+        # Signed: negative when the compact dtypes use less
+        return (results['true'][key] / results['false'][key] - 1) * 100
+
+    print(f"compact vs original: frame {change('frame_mib'):+.1f}%, peak RSS {change('peak_rss_mib'):+.1f}%, "
+          f"outputs {change('output_mib'):+.1f}%, time {change('seconds'):+.1f}%")
+
+
+if __name__ == '__main__':
+    main()
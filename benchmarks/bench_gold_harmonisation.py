@@ -0,0 +1,93 @@
+"""GoldLevel's harmonisation rules vs the original process_* functions, per dataset.
+
+Every (dataset, cycle) file of the synthetic silver layer is processed by the
+original function and by the compiled harmonisation plan. The outputs must
+be identical (values, dtypes, column order). Prints the time and the peak
+memory allocated (tracemalloc) per call, summed over the cycles.
+
+    python benchmarks/bench_gold_harmonisation.py --participants 10000 --filler-columns 40
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+# The original functions kept float64 columns and object null columns
+os.environ['GOLD_COMPACT_DTYPES'] = 'false'
+
+import gold_legacy_processing as legacy  # noqa: E402
+from nhanes_fixtures import DATASETS, YEARS, dataset_frame  # noqa: E402
+import GoldLevel  # noqa: E402
+
+LEGACY_FUNCTIONS = {
+    'BMX': legacy.process_bmx_file,
+    'DBQ': legacy.process_dbq_file,
+    'DEMO': legacy.process_demo_file,
+    'OHQ': legacy.process_ohq_file,
+    'SLQ': legacy.process_slq_file,
+    'SMQ': legacy.process_smq_file,
+    'SMQFAM': legacy.process_smqfam_file,
+    'SMQMEC': legacy.process_smqmec_file,
+    'WHQ': legacy.process_whq_file,
+    'SMQRTU': legacy.process_smqrtu_file,
+    'COT': legacy.process_cot_file,
+}
+
+
+def measure(function, year, frame, repeat):
+    """Best time and peak allocation of function(year, frame); also returns the output."""
+    best = None
+    for _ in range(repeat):
+        # The original functions rename the caller's frame in place, so each call gets its own
+        data = frame.copy()
+        start = time.perf_counter()
+        function(year, data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    data = frame.copy()
+    tracemalloc.start()
+    output = function(year, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=10000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'dataset':>8} {'files':>5}  {'original':>17}  {'rules':>17}")
+    totals = [0.0, 0, 0.0, 0]
+    for dataset in DATASETS:
+        files = 0
+        sums = [0.0, 0, 0.0, 0]
+        for year in YEARS:
+            frame = dataset_frame(dataset, year, args.participants, args.filler_columns)
+            if frame is None:
+                continue
+            files += 1
+            old_time, old_peak, expected = measure(LEGACY_FUNCTIONS[dataset], year, frame, args.repeat)
+            new_time, new_peak, actual = measure(GoldLevel.CATALOG.classify(f"{year}/{dataset}.csv").processor,
+                                                 year, frame, args.repeat)
+            pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+            for i, value in enumerate((old_time, old_peak, new_time, new_peak)):
+                sums[i] += value
+        totals = [total + value for total, value in zip(totals, sums)]
+        print(f"{dataset:>8} {files:>5}  {sums[0] * 1000:6.2f} ms {sums[1] / 2**20:5.1f} MiB  "
+              f"{sums[2] * 1000:6.2f} ms {sums[3] / 2**20:5.1f} MiB")
+    print(f"{'total':>8} {'':>5}  {totals[0] * 1000:6.2f} ms {totals[1] / 2**20:5.1f} MiB  "
+          f"{totals[2] * 1000:6.2f} ms {totals[3] / 2**20:5.1f} MiB")
+    print("outputs identical")
+
+
+if __name__ == '__main__':
+    main()
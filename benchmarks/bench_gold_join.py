@@ -0,0 +1,95 @@
+"""Time and peak memory of GoldLevel's per-year join against the original merge loop.
+
+Both run on the same processed frames (the synthetic silver layer after
+GoldLevel's harmonisation) for all ten cycles, and their results are checked
+to be identical, dtypes and row order included.
+
+    python benchmarks/bench_gold_join.py --participants 10000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nhanes_fixtures import silver_layer  # noqa: E402
+from shared_code import table_format  # noqa: E402
+import GoldLevel  # noqa: E402
+
+
+def processed_frames(participants, filler_columns):
+    by_year = {}
+    for name, frame in silver_layer(participants=participants, filler_columns=filler_columns):
+        dataset_file = GoldLevel.CATALOG.classify(name)
+        frame = table_format.apply_dtypes(frame, GoldLevel.HARMONISATION.source_dtypes(dataset_file.dataset,
+                                                                                       dataset_file.year) or {})
+        by_year.setdefault(dataset_file.year, []).append(dataset_file.processor(dataset_file.year, frame))
+    return by_year
+
+
+def merge_loop(by_year):
+    """The original GoldLevel assembly: one merge per file and one concat per year."""
+    final_df = pd.DataFrame()
+    for year, frames in by_year.items():
+        year_df = pd.DataFrame()
+        for data in frames:
+            if year_df.empty:
+                year_df = data
+            else:
+                year_df = pd.merge(year_df, data, on='SEQN', how='outer')
+            year_df['Year'] = year
+        final_df = pd.concat([final_df, year_df], axis=0)
+    return final_df
+
+
+def join_plan(by_year):
+    return pd.concat([GoldLevel.join_year_frames(year, frames) for year, frames in by_year.items()], axis=0)
+
+
+def fresh(by_year):
+    # The merge loop adds the Year column to the first frame of each year in place
+    return {year: [frame.copy() for frame in frames] for year, frames in by_year.items()}
+
+
+def measure(function, by_year, repeat):
+    times = []
+    for _ in range(repeat):
+        frames = fresh(by_year)
+        start = time.perf_counter()
+        result = function(frames)
+        times.append(time.perf_counter() - start)
+    frames = fresh(by_year)
+    tracemalloc.start()
+    function(frames)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=10000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')  # the processing functions assign to column slices
+    by_year = processed_frames(args.participants, args.filler_columns)
+
+    expected, merge_seconds, merge_peak = measure(merge_loop, by_year, args.repeat)
+    actual, join_seconds, join_peak = measure(join_plan, by_year, args.repeat)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    print(f"{len(by_year)} cycles, {sum(map(len, by_year.values()))} files -> "
+          f"{expected.shape[0]} rows x {expected.shape[1]} columns; results identical")
+    print(f"  merge loop: {merge_seconds:.3f}s, peak {merge_peak / 2**20:.1f} MiB allocated")
+    print(f"   join plan: {join_seconds:.3f}s, peak {join_peak / 2**20:.1f} MiB allocated")
+
+
+if __name__ == '__main__':
+    main()
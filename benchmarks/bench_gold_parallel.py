@@ -0,0 +1,78 @@
+"""Wall-clock time of GoldLevel with serial and concurrent downloads.
+
+GoldLevel runs against an in-process blob store that adds a fixed latency
+per request and a per-request bandwidth cap, standing in for Azurite or a
+real account. GOLD_MAX_CONCURRENCY=1 reproduces the original serial loop.
+
+    python benchmarks/bench_gold_parallel.py --latency 0.03 --concurrency 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+import azure.functions as func  # noqa: E402
+from fake_storage import FakeBlobStore  # noqa: E402
+from nhanes_fixtures import load_silver_layer  # noqa: E402
+from shared_code import table_format  # noqa: E402
+import GoldLevel  # noqa: E402
+
+
+def run_gold(store):
+    request = func.HttpRequest(method='POST', url='/api/GoldLevel', body=b'')
+    with store.patch(GoldLevel):
+        start = time.perf_counter()
+        response = GoldLevel.main(request)
+        elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode())
+    return elapsed
+
+
+def gold_outputs(store):
+    # The train and test tables; the manifest and other bookkeeping blobs start with '_'
+    return [table_format.read_table(store.get('gold-level', name)) for name in store.names('gold-level')
+            if not name.startswith('_')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=5000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=20)
+    parser.add_argument('--format', choices=sorted(table_format.FILE_EXTENSIONS), default='csv')
+    parser.add_argument('--latency', type=float, default=0.03, help="seconds per storage request")
+    parser.add_argument('--bandwidth', type=float, default=50, help="MB/s per request")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--parse-processes', type=int, default=0)
+    args = parser.parse_args()
+
+    store = FakeBlobStore(latency=args.latency, bandwidth=args.bandwidth * 1e6)
+    silver_bytes = load_silver_layer(store, args.format, participants=args.participants,
+                                     filler_columns=args.filler_columns)
+    files = len(store.names('silver-level'))
+    print(f"silver-level: {files} files, {silver_bytes / 2**20:.1f} MiB {args.format}; "
+          f"{args.latency * 1000:.0f} ms/request, {args.bandwidth:.0f} MB/s")
+
+    GoldLevel.PARSE_PROCESSES = args.parse_processes
+    baseline = None
+    for concurrency in args.concurrency:
+        GoldLevel.MAX_CONCURRENCY = concurrency
+        store.containers.pop('gold-level', None)
+        store.reset_stats()
+        elapsed = run_gold(store)
+        outputs = gold_outputs(store)
+        if baseline is None:
+            baseline = (elapsed, outputs)
+        else:
+            for expected, actual in zip(baseline[1], outputs):
+                assert expected.equals(actual), "outputs differ between concurrency levels"
+        label = 'serial' if concurrency == 1 else f"{concurrency} concurrent"
+        print(f"{label:>14}: {elapsed:.2f}s ({baseline[0] / elapsed:.1f}x), {store.requests} requests")
+
+
+if __name__ == '__main__':
+    main()
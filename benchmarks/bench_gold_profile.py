@@ -0,0 +1,101 @@
+"""Per-stage breakdown of a GoldLevel run, and what the instrumentation costs.
+
+GoldLevel runs against an in-process blob store (see bench_gold_parallel)
+`--runs` times in each mode:
+
+- 'plain': main() without telemetry (spans are no-ops outside an invocation);
+- 'spans': the instrumented main(), as deployed (metrics are only sent with
+  an instrumentation key, so none are here);
+- 'profile': profile mode, with cProfile and tracemalloc.
+
+Prints the median wall time of each mode, the stages of the last 'spans'
+run, and where the profile report went. The outputs of every mode must be
+the same.
+
+    python benchmarks/bench_gold_profile.py --participants 5000 --runs 5
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+import azure.functions as func  # noqa: E402
+from bench_gold_parallel import gold_outputs  # noqa: E402
+from fake_storage import FakeBlobStore  # noqa: E402
+from nhanes_fixtures import load_silver_layer  # noqa: E402
+from shared_code import table_format, telemetry  # noqa: E402
+import GoldLevel  # noqa: E402
+
+
+def run_gold(store, mode):
+    """Run GoldLevel once in `mode`; returns (seconds, invocation or None)."""
+    request = func.HttpRequest(method='POST', url='/api/GoldLevel', body=b'')
+    store.containers.pop('gold-level', None)
+    with store.patch(GoldLevel):
+        start = time.perf_counter()
+        if mode == 'plain':
+            current = None
+            response = GoldLevel.main.__wrapped__(request)
+        else:
+            with telemetry.invocation('GoldLevel', profile=mode == 'profile') as current:
+                response = GoldLevel.main.__wrapped__(request)
+        elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode())
+    return elapsed, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=5000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=20)
+    parser.add_argument('--format', choices=sorted(table_format.FILE_EXTENSIONS), default='csv')
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per storage request")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profile-dir', default=os.path.join(tempfile.gettempdir(), 'pipeline-profiles'))
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    telemetry.PROFILE_DIR = args.profile_dir
+    store = FakeBlobStore(latency=args.latency)
+    silver_bytes = load_silver_layer(store, args.format, participants=args.participants,
+                                     filler_columns=args.filler_columns)
+    print(f"silver-level: {len(store.names('silver-level'))} files, {silver_bytes / 2**20:.1f} MiB {args.format}; "
+          f"{args.latency * 1000:.0f} ms/request")
+
+    # Warm up the imports and caches
+    run_gold(store, 'plain')
+    expected = gold_outputs(store)
+
+    medians = {}
+    for mode in ('plain', 'spans', 'profile'):
+        times = []
+        for _ in range(args.runs if mode != 'profile' else 1):
+            seconds, current = run_gold(store, mode)
+            times.append(seconds)
+        for want, got in zip(expected, gold_outputs(store)):
+            assert want.equals(got), f"{mode} outputs differ"
+        medians[mode] = statistics.median(times)
+        if mode == 'spans':
+            stages = current.summary()
+
+    plain = medians['plain']
+    for mode, seconds in medians.items():
+        print(f"{mode:>8}: {seconds * 1000:8.1f} ms ({(seconds / plain - 1) * 100:+.1f}%)")
+
+    print(f"\n{'stage':<18} {'count':>6} {'ms':>9}  measures")
+    for stage, totals in stages.items():
+        measures = ', '.join(f"{name} {value:,}" for name, value in totals.items() if name not in ('count', 'seconds'))
+        print(f"{stage:<18} {totals['count']:>6} {totals['seconds'] * 1000:>9.1f}  {measures}")
+    print(f"\nprofile report in {args.profile_dir}")
+
+
+if __name__ == '__main__':
+    main()
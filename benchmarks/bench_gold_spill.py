@@ -0,0 +1,115 @@
+"""Peak memory of GoldLevel's in-memory and out-of-core (GOLD_BUILD=spill) builds as years are added.
+
+For each number of cycles in `--years`, a worker process loads that many
+cycles of the synthetic silver layer (`--participants` per cycle) into an
+in-process blob store that discards uploads, then runs GoldLevel in each
+build mode and reports the peak RSS over the loaded store, the time and the
+size of the spilled partitions. The memory build grows with every year; the
+spill build should stay near the cost of the largest single year. With
+`--check`, the outputs of both builds are first compared on a small layer,
+for both split modes.
+
+    python benchmarks/bench_gold_spill.py --participants 20000 --years 2 5 10 --split hash
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+from bench_xpt_conversion import _current_rss_kib, _peak_rss_kib, _reset_peak_rss  # noqa: E402
+from nhanes_fixtures import YEARS  # noqa: E402
+
+MODES = ('memory', 'spill')
+
+
+def run_gold(store, build_mode, split_mode):
+    """Run GoldLevel once; returns the MiB spilled to local disk."""
+    import azure.functions as func
+    import GoldLevel
+    from shared_code import telemetry
+
+    GoldLevel.BUILD_MODE = build_mode
+    GoldLevel.SPLIT_MODE = split_mode
+    store.containers.pop('gold-level', None)
+    with store.patch(GoldLevel), telemetry.invocation('GoldLevel') as current:
+        response = GoldLevel.main.__wrapped__(func.HttpRequest(method='POST', url='/api/GoldLevel', body=b''))
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode())
+    return current.summary().get('gold.spill', {}).get('bytes', 0) / 2**20
+
+
+def check_outputs(participants):
+    """Both builds write the same train and test tables, in both split modes."""
+    from bench_gold_parallel import gold_outputs
+    from fake_storage import FakeBlobStore
+    from nhanes_fixtures import load_silver_layer
+
+    store = FakeBlobStore()
+    load_silver_layer(store, 'csv', participants=participants, filler_columns=5)
+    for split_mode in ('random', 'hash'):
+        outputs = {}
+        for build_mode in MODES:
+            run_gold(store, build_mode, split_mode)
+            outputs[build_mode] = gold_outputs(store)
+        for memory, spill in zip(outputs['memory'], outputs['spill']):
+            assert memory.equals(spill), f"{split_mode} split: spill outputs differ"
+    print("memory and spill builds write the same outputs (random and hash splits)")
+
+
+def run_worker(build_mode, split_mode, years, participants, filler_columns):
+    import GoldLevel
+    from fake_storage import FakeBlobStore
+    from nhanes_fixtures import load_silver_layer
+
+    store = FakeBlobStore(discard_uploads=True)
+    silver_bytes = load_silver_layer(store, 'csv', years=YEARS[:years], participants=participants,
+                                     filler_columns=filler_columns)
+    GoldLevel.SPILL_DIR = tempfile.mkdtemp(prefix='bench-gold-spill-')
+    _reset_peak_rss()
+    baseline = _current_rss_kib()
+    start = time.perf_counter()
+    spilled_mib = run_gold(store, build_mode, split_mode)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mib': (_peak_rss_kib() - baseline) / 1024,
+                      'silver_mib': silver_bytes / 2**20, 'spilled_mib': spilled_mib}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participants', type=int, default=20000, help="participants per cycle")
+    parser.add_argument('--filler-columns', type=int, default=20)
+    parser.add_argument('--years', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--split', choices=['hash', 'random'], default='hash')
+    parser.add_argument('--check', action='store_true', help="first compare the outputs of both builds")
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.split, int(args.worker[1]), args.participants, args.filler_columns)
+        return
+
+    if args.check:
+        check_outputs(2000)
+
+    print(f"{args.participants} participants per cycle, {args.split} split")
+    for years in args.years:
+        for build_mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', build_mode, str(years), '--split', args.split,
+                 '--participants', str(args.participants), '--filler-columns', str(args.filler_columns)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            spilled = f", {result['spilled_mib']:.1f} MiB spilled" if build_mode == 'spill' else ''
+            print(f"{years:>3} cycles ({result['silver_mib']:6.1f} MiB csv) {build_mode:>7}: "
+                  f"peak RSS +{result['peak_rss_mib']:6.1f} MiB, {result['seconds']:5.2f}s{spilled}")
+
+
+if __name__ == '__main__':
+    main()
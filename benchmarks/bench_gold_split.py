@@ -0,0 +1,172 @@
+"""GoldLevel's SEQN-hash split and streamed outputs vs the original train_test_split.
+
+Checks the split contract first (the repo has no test suite, so this is
+where it is checked):
+
+- the test share matches the random split's (train_test_split(test_size=0.3))
+  to within the sampling noise of the hash, for 10k to 1M participants;
+- random_split picks exactly train_test_split's rows (when scikit-learn is
+  installed; the app no longer depends on it);
+- the assignment is deterministic, independent of row order and chunking,
+  and changes with the seed;
+- both outputs together hold every row exactly once, and RIDRETH1 is only
+  dropped from the train set.
+
+Then, in one subprocess per mode, times writing both outputs of a synthetic
+`--rows` gold frame to an in-process blob store (which drops the uploaded
+bytes, so they do not count) and reports the peak RSS over the frame itself.
+
+    python benchmarks/bench_gold_split.py --rows 1000000 --format csv
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+from bench_xpt_conversion import _current_rss_kib, _peak_rss_kib, _reset_peak_rss  # noqa: E402
+from shared_code import splitting, table_format  # noqa: E402
+
+
+def gold_frame(rows, seed=0):
+    """Synthetic final_df with GoldLevel's columns and dtypes."""
+    import GoldLevel
+
+    rng = np.random.default_rng(seed)
+    data = {}
+    for name, dtype in GoldLevel.COLUMN_DTYPES.items():
+        if name == 'SEQN':
+            data[name] = np.arange(1, rows + 1, dtype='int32')
+        elif dtype == 'float32':
+            data[name] = np.round(rng.normal(50, 15, rows), 1).astype('float32')
+        else:
+            values = pd.array(rng.integers(1, 10, rows), dtype=dtype)
+            values[rng.random(rows) < 0.05] = pd.NA
+            data[name] = values
+    years = np.repeat(np.arange(10), -(-rows // 10))[:rows]
+    data['Year'] = pd.Categorical.from_codes(years, dtype=GoldLevel.year_dtype())
+    return pd.DataFrame(data)
+
+
+def check_contract():
+    for participants in (10_000, 100_000, 1_000_000):
+        seqn = np.arange(1, participants + 1)
+        mask = splitting.in_test_set(seqn, 0.3, 42)
+        _, expected_test = splitting.random_split(participants, 0.3, 42)
+        share = mask.mean()
+        # Binomial standard error of the hash split's share
+        tolerance = 4 * np.sqrt(0.3 * 0.7 / participants)
+        assert abs(share - len(expected_test) / participants) < tolerance, (participants, share)
+        print(f"{participants:>9} participants: test share {share:.4f} "
+              f"(random split {len(expected_test) / participants:.4f}, tolerance {tolerance:.4f})")
+
+    try:
+        from sklearn.model_selection import train_test_split
+    except ImportError:
+        print("scikit-learn not installed, random_split not compared with train_test_split")
+    else:
+        for rows in (2, 3, 10, 1001, 20_000):
+            train_rows, test_rows = splitting.random_split(rows, 0.3, 42)
+            expected_train, expected_test = train_test_split(np.arange(rows), test_size=0.3, random_state=42)
+            assert (train_rows == expected_train).all() and (test_rows == expected_test).all(), rows
+        print("random_split picks the same rows as train_test_split")
+
+    seqn = np.arange(1, 100_001)
+    mask = splitting.in_test_set(seqn, 0.3, 42)
+    assert (splitting.in_test_set(seqn, 0.3, 42) == mask).all(), "not deterministic"
+    order = np.random.default_rng(1).permutation(len(seqn))
+    assert (splitting.in_test_set(seqn[order], 0.3, 42) == mask[order]).all(), "depends on row order"
+    chunks = np.concatenate([splitting.in_test_set(chunk, 0.3, 42) for chunk in np.array_split(seqn, 7)])
+    assert (chunks == mask).all(), "depends on chunking"
+    assert (splitting.in_test_set(seqn.astype('float64'), 0.3, 42) == mask).all(), "depends on key dtype"
+    other_seed = splitting.in_test_set(seqn, 0.3, 7)
+    print(f"deterministic, order and chunk independent; seed 7 moves {(other_seed != mask).mean():.1%} of rows")
+
+
+def check_outputs(output_format):
+    import GoldLevel
+    from fake_storage import FakeBlobStore
+
+    final_df = gold_frame(120_001)
+    store = FakeBlobStore()
+    container = store.service_client().get_container_client('gold-level')
+    GoldLevel.OUTPUT_FORMAT = output_format
+    GoldLevel.SPLIT_CHUNK_ROWS = 25_000
+    GoldLevel.write_hash_split(final_df, container.get_blob_client('train'), container.get_blob_client('test'), None)
+    train = table_format.read_table(store.get('gold-level', 'train'))
+    test = table_format.read_table(store.get('gold-level', 'test'))
+    assert 'RIDRETH1' not in train.columns and 'RIDRETH1' in test.columns.str.upper()
+    assert len(train) + len(test) == len(final_df)
+    assert not set(train['SEQN']) & set(test['SEQN'])
+    expected = final_df[splitting.in_test_set(final_df['SEQN'].to_numpy(), 0.3, 42)]
+    pd.testing.assert_frame_equal(test.reset_index(drop=True), expected.reset_index(drop=True).set_axis(
+        expected.columns.str.upper(), axis=1), check_dtype=output_format == 'parquet', check_categorical=False)
+    print(f"{output_format} outputs: every row once, test rows match the mask")
+
+
+def run_worker(mode, rows, output_format):
+    import GoldLevel
+    from fake_storage import FakeBlobStore
+    from azure.storage.blob import ContentSettings
+
+    final_df = gold_frame(rows)
+    store = FakeBlobStore(latency=0.01, bandwidth=200e6, discard_uploads=True)
+    container = store.service_client().get_container_client('gold-level')
+    train_client, test_client = container.get_blob_client('train'), container.get_blob_client('test')
+    content_settings = ContentSettings(content_type='application/octet-stream')
+    GoldLevel.OUTPUT_FORMAT = output_format
+    _reset_peak_rss()
+    baseline = _current_rss_kib()
+
+    start = time.perf_counter()
+    if mode == 'random':
+        # GoldLevel's GOLD_SPLIT=random path
+        train_rows, test_rows = splitting.random_split(len(final_df), 0.3, 42)
+        train_df, test_df = final_df.iloc[train_rows], final_df.iloc[test_rows]
+        train_df = train_df.drop(columns=['RIDRETH1'])
+        train_client.upload_blob(table_format.table_bytes(train_df, output_format), overwrite=True,
+                                 content_settings=content_settings)
+        test_client.upload_blob(table_format.table_bytes(test_df, output_format), overwrite=True,
+                                content_settings=content_settings)
+    else:
+        GoldLevel.write_hash_split(final_df, train_client, test_client, content_settings)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mib': (_peak_rss_kib() - baseline) / 1024,
+                      'frame_mib': final_df.memory_usage(deep=True).sum() / 2**20,
+                      'output_mib': store.bytes_uploaded / 2**20}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=sorted(table_format.FILE_EXTENSIONS), default='csv')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.rows, args.format)
+        return
+
+    check_contract()
+    for output_format in sorted(table_format.FILE_EXTENSIONS):
+        check_outputs(output_format)
+
+    for mode in ('random', 'hash'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', mode, '--rows', str(args.rows), '--format', args.format],
+            check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>7}: {result['seconds']:.2f}s, peak RSS +{result['peak_rss_mib']:.1f} MiB over a "
+              f"{result['frame_mib']:.1f} MiB frame, {result['output_mib']:.1f} MiB {args.format} uploaded")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Cold-start import time of each function, checked against a budget.
+
+The Python worker imports every function's module when it starts, so their
+imports add up on each cold start. Each function is imported in a fresh
+interpreter with `python -X importtime` (`--repeat` times, median taken) and
+its cumulative import time is compared with IMPORT_BUDGETS_MS; the whole
+worker (all the functions) is measured too. Independently of timing, no
+function may load DEFERRED_MODULES at import: those are imported by the
+invocations that use them. Exits with status 1 if a check fails.
+
+    python benchmarks/bench_import_time.py --repeat 5
+    python benchmarks/bench_import_time.py --root /path/to/other/checkout   # compare a tree
+
+Budgets are for a warm file cache on a development machine; `--budget-scale`
+scales them for slower machines.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FUNCTIONS = ['XPTtoCSVconversion', 'XPTBatchConversion', 'SilverLevel', 'GoldLevel', 'TriggerMLPipeline']
+# Milliseconds of cumulative import time; azure.functions and azure.storage.blob alone take about 250
+IMPORT_BUDGETS_MS = {
+    'XPTtoCSVconversion': 400,
+    'XPTBatchConversion': 400,
+    'SilverLevel': 400,
+    'GoldLevel': 400,
+    'TriggerMLPipeline': 400,
+}
+WORKER_BUDGET_MS = 450
+DEFERRED_MODULES = ['pandas', 'numpy', 'pyarrow', 'sklearn', 'azure.ai.ml', 'azure.identity', 'applicationinsights']
+
+
+def import_profile(root, modules):
+    """(cumulative microseconds per top-level module, direct imports by cost, deferred modules loaded)."""
+    code = (f"import json, sys; sys.path.insert(0, {root!r}); "
+            f"import {', '.join(modules)}; "
+            f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env={**os.environ, 'AzureWebJobsStorage': 'UseDevelopmentStorage=true'})
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    totals, children, current = {}, {}, []
+    # Each line is "import time: self | cumulative | <two spaces per level>name", children before parents
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 1:
+            current.append((int(cumulative), name))
+        elif depth == 0:
+            totals[name] = int(cumulative)
+            children[name] = sorted(current, reverse=True)
+            current = []
+    return totals, children, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--root', default=ROOT, help="function app to measure (default: this checkout)")
+    parser.add_argument('--budget-scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    failures = []
+    for label, modules, budget in [(name, [name], IMPORT_BUDGETS_MS[name]) for name in FUNCTIONS] + \
+                                  [('worker', FUNCTIONS, WORKER_BUDGET_MS)]:
+        budget *= args.budget_scale
+        try:
+            runs = [import_profile(args.root, modules) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{label:>18}: import failed: {e.args[0].strip().splitlines()[-1]}")
+            failures.append(label)
+            continue
+        milliseconds = statistics.median(sum(totals[m] for m in modules) for totals, _, _ in runs) / 1000
+        deferred = runs[0][2]
+        # The costliest direct imports of the function module(s)
+        direct = sorted((child for m in modules for child in runs[0][1][m]), reverse=True)
+        heaviest = ', '.join(f"{name} {cumulative / 1000:.0f}" for cumulative, name in direct[:3])
+        status = 'ok' if milliseconds <= budget and not deferred else 'OVER BUDGET' if not deferred else 'FAIL'
+        print(f"{label:>18}: {milliseconds:7.1f} ms (budget {budget:.0f}) {status:>11}   heaviest: {heaviest} ms")
+        if deferred:
+            print(f"{'':>18}  loads {', '.join(deferred)} at import")
+        if status != 'ok':
+            failures.append(label)
+
+    if failures:
+        print(f"failed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""End-to-end run of the pipeline against the in-process blob store, per stage.
+
+Generates synthetic NHANES-shaped XPT files (see nhanes_fixtures): every
+dataset of the first `--years` cycles with `--participants` rows each, plus
+`--extra-files` per cycle that SilverLevel leaves behind, in the
+input-data-files container of a FakeBlobStore with `--latency-ms` and
+`--bandwidth-mbs` per request. Then runs each function as the functions host
+would:
+
+- xpt: XPTtoCSVconversion once per file, each after the blob trigger's
+  download (`--xpt-mode trigger`), or one XPTBatchConversion call
+  (`--xpt-mode batch`, XPT_BATCH_PROCESSES=`--processes`);
+- silver: SilverLevel over the whole bronze level;
+- gold: GoldLevel;
+- trigger: TriggerMLPipeline triggered by GoldLevel's manifest, with a stub
+  MLClient.
+
+For each stage it prints the wall time, the peak RSS over the RSS at the
+start of the stage (conversion processes of the batch mode are not
+included), and the storage requests and bytes downloaded and uploaded. The
+run is checked end to end: every XPT file converted, only the pipeline's
+datasets promoted, every participant in exactly one of the train and test
+sets, and that pair registered once. `--breakdown` also prints the
+telemetry spans of each stage; `--json` writes all of it to a file, to
+compare runs.
+
+    python benchmarks/bench_pipeline.py --years 10 --participants 10000 --extra-files 5
+    python benchmarks/bench_pipeline.py --xpt-mode batch --processes 2 --format parquet --breakdown
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+for name in ('AZURE_SUBSCRIPTION_ID', 'AZURE_RESOURCE_GROUP', 'AZURE_ML_WORKSPACE_NAME'):
+    os.environ.setdefault(name, 'bench')
+
+import azure.functions as func  # noqa: E402
+from bench_xpt_conversion import _current_rss_kib, _peak_rss_kib, _reset_peak_rss  # noqa: E402
+from fake_ml import FakeMLClient  # noqa: E402
+from fake_storage import FakeBlobStore  # noqa: E402
+from nhanes_fixtures import DATASETS, SUFFIXES, YEARS, dataset_frame  # noqa: E402
+from xpt_fixtures import synthetic_frame, xpt_bytes  # noqa: E402
+
+INPUT_CONTAINER = 'input-data-files'
+
+
+def input_layer(store, years, participants, filler_columns, extra_files):
+    """Put the synthetic XPT files in the input container; returns {blob name: SEQNs} of the pipeline's files."""
+    seqns = {}
+    for year in years:
+        for dataset in DATASETS:
+            frame = dataset_frame(dataset, year, participants, filler_columns)
+            if frame is not None:
+                name = f"{year}/{dataset}{SUFFIXES[year]}.XPT"
+                store.put(INPUT_CONTAINER, name, xpt_bytes(frame, dataset))
+                seqns[name] = frame['SEQN']
+        for n in range(extra_files):
+            # Files of other NHANES components, which SilverLevel does not promote
+            frame = synthetic_frame(participants, filler_columns, seed=n)
+            store.put(INPUT_CONTAINER, f"{year}/EXTRA{n:02d}{SUFFIXES[year]}.XPT", xpt_bytes(frame, f'EXTRA{n:02d}'))
+    return seqns
+
+
+class TriggerBlob(func.blob.InputStream):
+    """The InputStream the host passes to a blob trigger, after downloading the blob."""
+
+    def __init__(self, store, container, name):
+        data = store.service_client().get_blob_client(container, name).download_blob().readall()
+        super().__init__(data=data, name=f"{container}/{name}")
+
+
+def run_xpt(store, mode):
+    if mode == 'batch':
+        import XPTBatchConversion
+
+        with store.patch(XPTBatchConversion):
+            response = XPTBatchConversion.main.__wrapped__(
+                func.HttpRequest(method='POST', url='/api/XPTBatchConversion', body=b''))
+        if response.status_code != 200:
+            raise RuntimeError(response.get_body().decode()[:1000])
+        return
+
+    import XPTtoCSVconversion
+
+    with store.patch(XPTtoCSVconversion):
+        for name in store.names(INPUT_CONTAINER):
+            XPTtoCSVconversion.main.__wrapped__(TriggerBlob(store, INPUT_CONTAINER, name))
+
+
+def run_silver(store):
+    import SilverLevel
+
+    with store.patch(SilverLevel):
+        response = SilverLevel.main.__wrapped__(func.HttpRequest(method='POST', url='/api/SilverLevel', body=b''))
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode()[:1000])
+
+
+def run_gold(store):
+    import GoldLevel
+
+    with store.patch(GoldLevel):
+        response = GoldLevel.main.__wrapped__(func.HttpRequest(method='POST', url='/api/GoldLevel', body=b''))
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode()[:1000])
+
+
+def run_trigger(store, ml):
+    import TriggerMLPipeline
+    from shared_code import manifest
+
+    with store.patch(TriggerMLPipeline), ml.patch():
+        TriggerMLPipeline.main.__wrapped__(TriggerBlob(store, 'gold-level', manifest.MANIFEST_BLOB))
+
+
+def run_stage(stage, store, function, *args):
+    """Run one stage in its own telemetry invocation; returns its measurements."""
+    from shared_code import telemetry
+
+    store.reset_stats()
+    _reset_peak_rss()
+    baseline = _current_rss_kib()
+    start = time.perf_counter()
+    with telemetry.invocation(stage) as current:
+        function(store, *args)
+    seconds = time.perf_counter() - start
+    return {'stage': stage, 'seconds': seconds, 'peak_rss_mib': (_peak_rss_kib() - baseline) / 1024,
+            **store.stats(), 'spans': current.summary()}
+
+
+def check_outputs(store, seqns, ml, output_format):
+    """The end-to-end checks; returns a one-line summary."""
+    from shared_code import datasets, manifest, table_format
+
+    extension = table_format.FILE_EXTENSIONS[output_format]
+    inputs = store.names(INPUT_CONTAINER)
+    bronze = store.names('bronze-level')
+    assert sorted(name.rsplit('.', 1)[0] for name in inputs) == sorted(name.rsplit('.', 1)[0] for name in bronze), \
+        "bronze-level does not hold one output per XPT file"
+    assert all(name.endswith(extension) for name in bronze)
+
+    silver = store.names('silver-level')
+    catalog = datasets.DatasetCatalog()
+    assert silver == sorted(name for name in bronze if catalog.classify(name) is not None), \
+        "silver-level does not hold exactly the pipeline's datasets"
+
+    latest = manifest.parse(store.get('gold-level', manifest.MANIFEST_BLOB))
+    train = table_format.read_table(store.get('gold-level', latest['train']))
+    test = table_format.read_table(store.get('gold-level', latest['test']))
+    participants = set()
+    for values in seqns.values():
+        participants.update(values.astype(int))
+    train_seqn, test_seqn = set(train['SEQN'].astype(int)), set(test['SEQN'].astype(int))
+    assert len(train) + len(test) == len(participants) and not train_seqn & test_seqn \
+        and train_seqn | test_seqn == participants, "the train and test sets are not a partition of the participants"
+    assert 'RIDRETH1' not in train.columns
+
+    registered = sorted(asset.name for asset in ml.registered)
+    assert registered == [f"testing_data_{latest['run_id']}", f"training_data_{latest['run_id']}"], registered
+    return (f"{len(inputs)} XPT -> {len(bronze)} bronze -> {len(silver)} silver -> "
+            f"{len(train)} train + {len(test)} test rows x {len(test.columns)} columns -> {len(registered)} assets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=len(YEARS), help="number of survey cycles, from 1999-2000")
+    parser.add_argument('--participants', type=int, default=5000, help="rows per file")
+    parser.add_argument('--filler-columns', type=int, default=20, help="columns per file beyond the selected ones")
+    parser.add_argument('--extra-files', type=int, default=2, help="other XPT files per cycle")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="bronze/silver/gold file format")
+    parser.add_argument('--xpt-mode', choices=['trigger', 'batch'], default='trigger')
+    parser.add_argument('--processes', type=int, default=0, help="conversion processes of the batch mode")
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--bandwidth-mbs', type=float, default=100.0)
+    parser.add_argument('--breakdown', action='store_true', help="print the telemetry spans of each stage")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    # Read by the functions when they are imported
+    os.environ['OUTPUT_FORMAT'] = args.format
+    os.environ['XPT_BATCH_PROCESSES'] = str(args.processes)
+    logging.disable(logging.CRITICAL)
+
+    store = FakeBlobStore(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbs * 1e6)
+    seqns = input_layer(store, YEARS[:args.years], args.participants, args.filler_columns, args.extra_files)
+    inputs = store.names(INPUT_CONTAINER)
+    input_mib = sum(len(store.get(INPUT_CONTAINER, name)) for name in inputs) / 2**20
+    print(f"{len(inputs)} XPT files over {args.years} cycles ({args.participants} rows each), "
+          f"{input_mib:.1f} MiB; {args.format} outputs, "
+          f"{args.latency_ms:g} ms and {args.bandwidth_mbs:g} MB/s per request")
+
+    ml = FakeMLClient()
+    results = [
+        run_stage('xpt', store, run_xpt, args.xpt_mode),
+        run_stage('silver', store, run_silver),
+        run_stage('gold', store, run_gold),
+        run_stage('trigger', store, run_trigger, ml),
+    ]
+    summary = check_outputs(store, seqns, ml, args.format)
+
+    print(f"\n{'stage':>8} {'seconds':>9} {'peak RSS':>12} {'requests':>9} {'downloaded':>12} {'uploaded':>12}")
+    for result in results:
+        print(f"{result['stage']:>8} {result['seconds']:9.2f} {result['peak_rss_mib']:+8.1f} MiB "
+              f"{result['requests']:>9} {result['bytes_downloaded'] / 2**20:8.1f} MiB "
+              f"{result['bytes_uploaded'] / 2**20:8.1f} MiB")
+    print(f"{'total':>8} {sum(result['seconds'] for result in results):9.2f}")
+    print(summary)
+
+    if args.breakdown:
+        for result in results:
+            print(f"\n{result['stage']}:")
+            for stage, totals in result['spans'].items():
+                measures = ', '.join(f"{name} {value:,}" for name, value in totals.items()
+                                     if name not in ('count', 'seconds'))
+                print(f"  {stage:<20} {totals['count']:>6} {totals['seconds']:9.3f}s  {measures}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'arguments': vars(args), 'input_mib': input_mib, 'stages': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Bronze→silver promotion: the original serial copy loop vs SilverLevel.
+
+The bronze container holds `--files` small blobs spread over the ten cycle
+folders. Runs, against an in-process store with a fixed latency per request:
+
+- original: list everything, copy one blob at a time, stop at the first
+  copy that is not finished synchronously;
+- cold: SilverLevel into an empty silver container;
+- rerun: nothing changed, so every blob is skipped;
+- touched: 1% of the bronze blobs re-uploaded;
+- async: cold run where every copy stays pending for `--copy-latency` seconds.
+
+    python benchmarks/bench_silver_promotion.py --files 5000 --latency 0.02
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+import azure.functions as func  # noqa: E402
+from fake_storage import FakeBlobStore  # noqa: E402
+from nhanes_fixtures import DATASETS, YEARS  # noqa: E402
+import SilverLevel  # noqa: E402
+
+
+def load_bronze(store, files):
+    for n in range(files):
+        year = YEARS[n % len(YEARS)]
+        dataset = DATASETS[(n // len(YEARS)) % len(DATASETS)]
+        store.put('bronze-level', f"{year}/{n:06d}/{dataset}.csv", f"SEQN,{dataset}\n{n},1\n".encode())
+
+
+def original_promotion(store):
+    # The loop SilverLevel used before, against the same store
+    service = store.service_client()
+    source = service.get_container_client('bronze-level')
+    target = service.get_container_client('silver-level')
+    copied = 0
+    for blob in source.list_blobs():
+        if re.search(r'\b(?:BMX|DBQ|DEMO|COT|OHQ|SLQ|SMQ|SMQFAM|SMQMEC|WHQ|SLQ|SMQRTU)\b', blob.name):
+            status = target.get_blob_client(blob.name).start_copy_from_url(source.get_blob_client(blob).url)
+            if status['copy_status'] != 'success':
+                return f"aborted at {blob.name} after {copied} copies"
+            copied += 1
+    return f"{copied} copied"
+
+
+def run_silver(store):
+    request = func.HttpRequest(method='POST', url='/api/SilverLevel', body=b'')
+    with store.patch(SilverLevel):
+        response = SilverLevel.main(request)
+    return response.get_body().decode()
+
+
+def timed(label, store, run):
+    store.reset_stats()
+    start = time.perf_counter()
+    message = run(store)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>9}: {elapsed:6.2f}s, {store.requests:6d} requests  {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per storage request")
+    parser.add_argument('--copy-latency', type=float, default=3.0, help="seconds an async copy stays pending")
+    parser.add_argument('--concurrency', type=int, default=SilverLevel.MAX_CONCURRENCY)
+    args = parser.parse_args()
+    SilverLevel.MAX_CONCURRENCY = args.concurrency
+    SilverLevel.COPY_POLL_SECONDS = 1
+
+    store = FakeBlobStore(latency=args.latency)
+    load_bronze(store, args.files)
+    print(f"bronze-level: {args.files} blobs; {args.latency * 1000:.0f} ms/request, "
+          f"{args.concurrency} concurrent")
+
+    timed('original', store, original_promotion)
+    store.containers.pop('silver-level')
+    timed('cold', store, run_silver)
+    timed('rerun', store, run_silver)
+    for name in store.names('bronze-level')[::100]:
+        store.put('bronze-level', name, store.get('bronze-level', name) + b'\n')
+    timed('touched', store, run_silver)
+    assert all(store.get('silver-level', name) == store.get('bronze-level', name)
+               for name in store.names('bronze-level'))
+
+    store.containers.pop('silver-level')
+    store.copy_latency = args.copy_latency
+    timed('original', store, original_promotion)
+    store.containers.pop('silver-level')
+    timed('async', store, run_silver)
+    timed('rerun', store, run_silver)
+
+
+if __name__ == '__main__':
+    main()
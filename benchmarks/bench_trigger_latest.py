@@ -0,0 +1,104 @@
+"""TriggerMLPipeline: manifest lookup vs listing every historic gold-level blob.
+
+The gold-level container holds `--blobs` historic train/test outputs (10,
+1k and 100k by default) in an in-process blob store with `--latency-ms` per
+request. For each size:
+
+- 'listing' is the original lookup: list every train* and test* blob with
+  metadata and take the newest of each (by Last-Modified; the original read
+  a 'last_modified' metadata key that GoldLevel never set);
+- 'manifest' is TriggerMLPipeline.main triggered by the manifest GoldLevel
+  writes, with a stub MLClient, including its duplicate-delivery check.
+
+Both must find the same pair. Then one GoldLevel run is simulated: the
+original binding fired once per output file, the manifest binding fires
+once (and a duplicate delivery of it registers nothing).
+
+    python benchmarks/bench_trigger_latest.py --blobs 10 1000 100000 --latency-ms 5
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+for name in ('AZURE_SUBSCRIPTION_ID', 'AZURE_RESOURCE_GROUP', 'AZURE_ML_WORKSPACE_NAME'):
+    os.environ.setdefault(name, 'bench')
+
+from fake_ml import FakeMLClient  # noqa: E402
+from fake_storage import FakeBlobStore  # noqa: E402
+from shared_code import manifest  # noqa: E402
+import TriggerMLPipeline  # noqa: E402
+
+
+class TriggerBlob:
+    """The InputStream a blob trigger passes to main()."""
+
+    def __init__(self, store, container, name):
+        self.name = f"{container}/{name}"
+        self._data = store.get(container, name)
+
+    def read(self, size=-1):
+        return self._data
+
+
+def gold_container(blobs):
+    """Store with `blobs` historic outputs (train/test pairs, oldest first) and the manifest of the newest."""
+    store = FakeBlobStore()
+    start = datetime(2024, 1, 1)
+    for i in range(blobs // 2):
+        stamp = (start + timedelta(minutes=i)).strftime('%Y-%m-%d-%H-%M-%S')
+        store.put('gold-level', f"traindata_{stamp}.csv", b'')
+        store.put('gold-level', f"testdata_{stamp}.csv", b'')
+    container = store.service_client().get_container_client('gold-level')
+    manifest.write(container, stamp.replace('-', ''), f"traindata_{stamp}.csv", f"testdata_{stamp}.csv")
+    return store, container
+
+
+def listing_lookup(container_client):
+    """The original TriggerMLPipeline lookup."""
+    train_blobs = list(container_client.list_blobs(name_starts_with='train', include=['metadata']))
+    test_blobs = list(container_client.list_blobs(name_starts_with='test', include=['metadata']))
+    return (max(train_blobs, key=lambda x: x.last_modified).name,
+            max(test_blobs, key=lambda x: x.last_modified).name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blobs', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'blobs':>7}  {'listing':>22}  {'manifest':>22}")
+    for blobs in args.blobs:
+        store, container = gold_container(blobs)
+        store.latency = args.latency_ms / 1000
+
+        store.reset_stats()
+        start = time.perf_counter()
+        expected = listing_lookup(container)
+        listing_seconds, listing_requests = time.perf_counter() - start, store.requests
+
+        ml = FakeMLClient()
+        with store.patch(), ml.patch():
+            store.reset_stats()
+            start = time.perf_counter()
+            TriggerMLPipeline.main(TriggerBlob(store, 'gold-level', manifest.MANIFEST_BLOB))
+            manifest_seconds, manifest_requests = time.perf_counter() - start, store.requests
+            # A second delivery of the same trigger
+            TriggerMLPipeline.main(TriggerBlob(store, 'gold-level', manifest.MANIFEST_BLOB))
+
+        found = tuple(asset.path.rsplit('/', 1)[1] for asset in ml.registered)
+        assert found == expected, (found, expected)
+        print(f"{blobs:>7}  {listing_seconds * 1000:9.1f} ms {listing_requests:4} requests  "
+              f"{manifest_seconds * 1000:9.1f} ms {manifest_requests:4} requests")
+
+    print("registrations per GoldLevel run: original binding 2 pairs (one trigger per output file), "
+          f"manifest binding {len(ml.registered) // 2} pair (duplicate delivery skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Throughput of the native XPORT decoder against pd.read_sas.
+
+Before timing, the two readers' outputs are compared exactly on the same
+file, including chunked reads, so a speedup never comes from a wrong answer.
+The one expected difference is the value of an IBM zero (see shared_code/xport.py).
+
+    python benchmarks/bench_xport_decoder.py --rows 200000 --columns 120
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shared_code import xport  # noqa: E402
+from xpt_fixtures import synthetic_frame, xpt_bytes  # noqa: E402
+
+
+# What pd.read_sas returns for an IBM zero; the native reader returns 0.0
+PANDAS_ZERO = 5.397605346934028e-79
+
+
+def verify(data, chunksize):
+    expected = pd.read_sas(io.BytesIO(data), format='xport').replace(PANDAS_ZERO, 0.0)
+    pd.testing.assert_frame_equal(xport.read_xport(io.BytesIO(data)), expected, check_exact=True)
+    chunks = list(xport.XportReader(io.BytesIO(data), chunksize=chunksize))
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected, check_exact=True)
+    # The CSV written to bronze-level must not change either
+    assert xport.read_xport(io.BytesIO(data)).to_csv(index=False) == expected.to_csv(index=False)
+
+
+def best_of(repeat, read):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=120, help="numeric columns besides SEQN")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows, args.columns)
+    # Questionnaire files carry a few character columns too
+    df['TXTCODE'] = pd.Series(['A', 'BC', 'DEF'] * (args.rows // 3 + 1)).iloc[:args.rows].to_numpy(dtype=object)
+    data = xpt_bytes(df, 'BENCH')
+    mib = len(data) / 2**20
+    print(f"XPT input: {args.rows} rows x {len(df.columns)} columns, {mib:.1f} MiB")
+
+    verify(data, chunksize=max(1, args.rows // 7))
+    print("verified: native output identical to pd.read_sas (whole file, chunked and CSV), zeros aside")
+
+    results = {
+        'pd.read_sas': best_of(args.repeat, lambda: pd.read_sas(io.BytesIO(data), format='xport')),
+        'xport.read_xport': best_of(args.repeat, lambda: xport.read_xport(io.BytesIO(data))),
+    }
+    for name, seconds in results.items():
+        print(f"{name:>17}: {seconds:.3f}s, {mib / seconds:.1f} MiB/s, {args.rows / seconds:,.0f} rows/s")
+    print(f"speedup: {results['pd.read_sas'] / results['xport.read_xport']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Batch XPT conversion vs one XPTtoCSVconversion invocation per blob.
+
+Puts `--files` synthetic XPT files in the input container of an in-process
+blob store with `--latency-ms` per request and `--bandwidth-mbs` per
+request, then converts them:
+
+- 'per-blob': XPTtoCSVconversion.main once per file, one after the other,
+  each after the download the functions host does for a blob trigger;
+- 'batch N': one XPTBatchConversion call with XPT_BATCH_PROCESSES=N
+  (0 converts in the download threads).
+
+The outputs must be byte-identical. Prints the wall time, files per second
+and the per-file download/convert/upload times the batch call reports (p50
+and max). Conversion only scales with processes up to the CPUs available.
+
+    python benchmarks/bench_xpt_batch.py --files 40 --rows 20000 --processes 0 1 4
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+from fake_storage import FakeBlobStore  # noqa: E402
+from xpt_fixtures import synthetic_frame, write_xpt  # noqa: E402
+
+
+def input_store(files, rows, columns):
+    import io
+
+    store = FakeBlobStore()
+    for i in range(files):
+        out = io.BytesIO()
+        write_xpt(synthetic_frame(rows, columns, seed=i), out, f'DATA{i:03d}')
+        store.put('input-data-files', f"{2001 + 2 * (i % 10)}-{2002 + 2 * (i % 10)}/DATA{i:03d}.XPT", out.getvalue())
+    return store
+
+
+def outputs(store):
+    return {name: store.get('bronze-level', name) for name in store.names('bronze-level')}
+
+
+def run_per_blob(store):
+    import azure.functions as func
+    import XPTtoCSVconversion
+
+    names = store.names('input-data-files')
+    with store.patch(XPTtoCSVconversion):
+        start = time.perf_counter()
+        for name in names:
+            # The host downloads the blob before invoking the trigger
+            data = store.service_client().get_blob_client('input-data-files', name).download_blob().readall()
+            XPTtoCSVconversion.main(func.blob.InputStream(data=data, name=f"input-data-files/{name}"))
+        return time.perf_counter() - start, None
+
+
+def run_batch(store, processes):
+    import azure.functions as func
+    import XPTBatchConversion
+
+    XPTBatchConversion.PROCESSES = processes
+    with store.patch(XPTBatchConversion):
+        start = time.perf_counter()
+        response = XPTBatchConversion.main(func.HttpRequest(method='POST', url='/api/XPTBatchConversion', body=b''))
+        elapsed = time.perf_counter() - start
+    body = json.loads(response.get_body())
+    if response.status_code != 200:
+        raise RuntimeError(body['failed'])
+    return elapsed, body['files']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, os.cpu_count() or 1])
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--bandwidth-mbs', type=float, default=50.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    template = input_store(args.files, args.rows, args.columns)
+    input_mib = sum(len(template.get('input-data-files', name)) for name in template.names('input-data-files')) / 2**20
+    print(f"{args.files} XPT files, {input_mib:.1f} MiB, {os.cpu_count()} CPUs, "
+          f"{args.latency_ms:g} ms and {args.bandwidth_mbs:g} MB/s per request")
+
+    expected = None
+    for mode in ['per-blob'] + [f'batch {processes}' for processes in dict.fromkeys(args.processes)]:
+        store = FakeBlobStore(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbs * 1e6)
+        store.containers['input-data-files'] = template.containers['input-data-files']
+        if mode == 'per-blob':
+            seconds, files = run_per_blob(store)
+        else:
+            seconds, files = run_batch(store, int(mode.split()[1]))
+        result = outputs(store)
+        if expected is None:
+            expected = result
+        assert result == expected, f"{mode} outputs differ"
+
+        line = f"{mode:>10}: {seconds:6.2f}s, {args.files / seconds:5.1f} files/s"
+        if files:
+            for step in ('download', 'convert', 'upload'):
+                times = [file[f'{step}_seconds'] * 1000 for file in files]
+                line += f"   {step} p50 {np.median(times):5.0f} ms max {max(times):5.0f} ms"
+        print(line)
+    print("outputs identical")
+
+
+if __name__ == '__main__':
+    main()
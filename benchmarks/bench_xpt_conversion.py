@@ -0,0 +1,125 @@
+"""Peak memory and throughput of the XPT -> CSV conversion modes.
+
+Each mode runs in its own subprocess so the peak RSS of one does not hide the
+other. The upload target is a blob client that only counts bytes, so the
+numbers reflect the conversion itself rather than the network.
+
+    python benchmarks/bench_xpt_conversion.py --rows 500000 --columns 40
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class CountingBlobClient:
+    """Accepts uploads and staged blocks but keeps only their sizes."""
+
+    def __init__(self):
+        self.bytes_uploaded = 0
+        self.blocks = 0
+
+    def upload_blob(self, data, **kwargs):
+        self.bytes_uploaded += len(data)
+
+    def stage_block(self, block_id, data, **kwargs):
+        self.bytes_uploaded += len(data)
+        self.blocks += 1
+
+    def commit_block_list(self, block_list, **kwargs):
+        pass
+
+
+def _reset_peak_rss():
+    # Loading the input can transiently double it; don't count that as conversion memory
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_kib():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _current_rss_kib():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def run_worker(mode, path, chunk_rows):
+    import azure.functions as func
+    from shared_code import xpt_conversion as conversion
+
+    with open(path, 'rb') as xpt_file:
+        # The functions host hands the trigger the whole blob as bytes
+        myblob = func.blob.InputStream(data=xpt_file.read(), name=f"input-data-files/bench/{os.path.basename(path)}")
+    client = CountingBlobClient()
+    _reset_peak_rss()
+    baseline = _current_rss_kib()
+
+    start = time.perf_counter()
+    if mode == 'buffered':
+        rows = conversion.convert_xpt_buffered(myblob.read(), client)
+    else:
+        with conversion.spool_input(myblob) as spool:
+            rows = conversion.convert_xpt_streaming(spool, client, chunk_rows=chunk_rows)
+    elapsed = time.perf_counter() - start
+
+    peak = _peak_rss_kib()
+    print(json.dumps({
+        'mode': mode,
+        'rows': rows,
+        'seconds': elapsed,
+        'peak_rss_over_input_mib': (peak - baseline) / 1024,
+        'csv_mib': client.bytes_uploaded / 2**20,
+        'blocks': client.blocks,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.chunk_rows)
+        return
+
+    from xpt_fixtures import synthetic_frame, write_xpt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'BENCH.XPT')
+        with open(path, 'wb') as out:
+            write_xpt(synthetic_frame(args.rows, args.columns), out, 'BENCH')
+        xpt_mib = os.path.getsize(path) / 2**20
+        print(f"XPT input: {args.rows} rows x {args.columns + 1} columns, {xpt_mib:.1f} MiB")
+
+        for mode in ('buffered', 'streaming'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, path, '--chunk-rows', str(args.chunk_rows)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{mode:>10}: {result['seconds']:.2f}s, {xpt_mib / result['seconds']:.1f} MiB/s XPT, "
+                  f"{result['rows'] / result['seconds']:,.0f} rows/s, "
+                  f"peak RSS +{result['peak_rss_over_input_mib']:.1f} MiB over input, "
+                  f"{result['csv_mib']:.1f} MiB CSV in {result['blocks'] or 1} upload(s)")
+
+
+if __name__ == '__main__':
+    main()
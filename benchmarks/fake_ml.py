@@ -0,0 +1,80 @@
+"""In-process stand-in for the parts of azure-ai-ml that TriggerMLPipeline uses.
+
+FakeMLClient records every data asset registered through
+`ml_client.data.create_or_update`, with an optional latency per call.
+`patch()` makes `shared_code.clients.ml_client` return it and, when
+azure-ai-ml is not installed, provides stub `azure.ai.ml.constants` and
+`azure.ai.ml.entities` modules so the function code runs unchanged.
+
+    ml = FakeMLClient()
+    with ml.patch():
+        TriggerMLPipeline.main(blob)
+    ml.registered  # [Data(...), ...]
+"""
+import contextlib
+import importlib.util
+import sys
+import threading
+import time
+import types
+from unittest import mock
+
+
+class Data:
+    def __init__(self, path=None, type=None, name=None, description=None, version=None, **kwargs):
+        self.path = path
+        self.type = type
+        self.name = name
+        self.description = description
+        self.version = version
+
+    def __repr__(self):
+        return f"Data(name={self.name!r}, path={self.path!r})"
+
+
+class _DataOperations:
+    def __init__(self, client):
+        self._client = client
+        self._versions = {}
+
+    def create_or_update(self, data):
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        with self._client._lock:
+            # Like the service: a name without a version gets the next version number
+            version = self._versions.get(data.name, 0) + 1
+            self._versions[data.name] = version
+            registered = Data(path=data.path, type=data.type, name=data.name, description=data.description,
+                              version=str(data.version or version))
+            self._client.registered.append(registered)
+        return registered
+
+
+class FakeMLClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.registered = []
+        self._lock = threading.Lock()
+        self.data = _DataOperations(self)
+
+    @contextlib.contextmanager
+    def patch(self):
+        from shared_code import clients
+
+        with contextlib.ExitStack() as stack:
+            if importlib.util.find_spec('azure.ai') is None:
+                stack.enter_context(mock.patch.dict(sys.modules, _stub_modules()))
+            stack.enter_context(mock.patch.object(clients, 'ml_client', lambda *args, **kwargs: self))
+            yield self
+
+
+def _stub_modules():
+    constants = types.ModuleType('azure.ai.ml.constants')
+    constants.AssetTypes = types.SimpleNamespace(MLTABLE='mltable', URI_FILE='uri_file', URI_FOLDER='uri_folder')
+    entities = types.ModuleType('azure.ai.ml.entities')
+    entities.Data = Data
+    ml = types.ModuleType('azure.ai.ml')
+    ml.constants, ml.entities = constants, entities
+    ai = types.ModuleType('azure.ai')
+    ai.ml = ml
+    return {'azure.ai': ai, 'azure.ai.ml': ml, 'azure.ai.ml.constants': constants, 'azure.ai.ml.entities': entities}
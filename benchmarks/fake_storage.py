@@ -0,0 +1,327 @@
+"""In-process stand-in for Azure Blob Storage.
+
+Implements the subset of the azure-storage-blob client API the functions
+use, backed by dictionaries, so benchmarks can run the real function code
+without an account or Azurite. An optional per-request latency models
+network round trips, and every client counts the requests and bytes it
+serves. With `copy_latency`, server-side copies stay pending for that many
+seconds, like asynchronous copies of large blobs.
+
+    store = FakeBlobStore(latency=0.005)
+    with store.patch():
+        GoldLevel.main(request)
+"""
+import contextlib
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+from azure.core import exceptions
+
+
+# The SDK's exception types, so code catching them handles the fake's errors too
+class ResourceExistsError(exceptions.ResourceExistsError):
+    def __init__(self, message, error_code):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class ResourceNotFoundError(exceptions.ResourceNotFoundError):
+    def __init__(self, message, error_code='BlobNotFound'):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class FakeBlobProperties:
+    """BlobProperties look-alike: attribute and item access."""
+
+    def __init__(self, **properties):
+        self.__dict__.update(properties)
+
+    def __getitem__(self, name):
+        return self.__dict__[name]
+
+    def get(self, name, default=None):
+        return self.__dict__.get(name, default)
+
+
+class _Blob:
+    __slots__ = ('data', 'etag', 'last_modified', 'metadata', 'content_md5', 'tags', 'blocks',
+                 'copy_id', 'copy_completes_at')
+
+    def __init__(self, data, metadata=None):
+        self.data = bytes(data)
+        self.last_modified = datetime.now(timezone.utc)
+        self.etag = hashlib.md5(self.data + str(time.time_ns()).encode()).hexdigest()
+        self.content_md5 = hashlib.md5(self.data).digest()
+        self.metadata = dict(metadata or {})
+        self.tags = {}
+        self.copy_id = None
+        self.copy_completes_at = None
+
+    def copy_status(self):
+        if self.copy_id is None:
+            return None
+        return 'pending' if time.monotonic() < self.copy_completes_at else 'success'
+
+
+class FakeBlobStore:
+    """All containers of one storage account, plus request statistics."""
+
+    def __init__(self, latency=0.0, bandwidth=None, copy_latency=0.0, discard_uploads=False):
+        self.containers = {}
+        self.latency = latency
+        # bytes per second per request; None for unlimited
+        self.bandwidth = bandwidth
+        # seconds until a server-side copy completes; 0 completes synchronously
+        self.copy_latency = copy_latency
+        # Keep uploaded blobs empty, so memory benchmarks only see the code under test
+        self.discard_uploads = discard_uploads
+        self.requests = 0
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+        self._lock = threading.Lock()
+
+    # Accounting -------------------------------------------------------
+
+    def _request(self, downloaded=0, uploaded=0):
+        with self._lock:
+            self.requests += 1
+            self.bytes_downloaded += downloaded
+            self.bytes_uploaded += uploaded
+        delay = self.latency
+        if self.bandwidth:
+            delay += (downloaded + uploaded) / self.bandwidth
+        if delay:
+            time.sleep(delay)
+
+    def reset_stats(self):
+        self.requests = self.bytes_downloaded = self.bytes_uploaded = 0
+
+    def stats(self):
+        return {'requests': self.requests, 'bytes_downloaded': self.bytes_downloaded,
+                'bytes_uploaded': self.bytes_uploaded}
+
+    # Direct access for test setup --------------------------------------
+
+    def put(self, container, name, data, metadata=None):
+        self.containers.setdefault(container, {})[name] = _Blob(data, metadata)
+
+    def get(self, container, name):
+        return self.containers[container][name].data
+
+    def names(self, container, prefix=''):
+        return sorted(name for name in self.containers.get(container, {}) if name.startswith(prefix))
+
+    # Client factory ----------------------------------------------------
+
+    def service_client(self):
+        return FakeBlobServiceClient(self)
+
+    @contextlib.contextmanager
+    def patch(self, *modules):
+        """Make BlobServiceClient.from_connection_string return clients for this store.
+
+        Patches `azure.storage.blob.BlobServiceClient` and the name in
+        shared_code.clients and in each of `modules`, which must already be
+        imported. The clients cached by shared_code.clients are dropped on
+        entry and exit, so no client outlives the store it belongs to.
+        """
+        from shared_code import clients
+
+        factory = mock.Mock()
+        factory.from_connection_string = lambda *args, **kwargs: self.service_client()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch('azure.storage.blob.BlobServiceClient', factory))
+            for module in (clients, *modules):
+                if hasattr(module, 'BlobServiceClient'):
+                    stack.enter_context(mock.patch.object(module, 'BlobServiceClient', factory))
+            clients.reset()
+            stack.callback(clients.reset)
+            yield self
+
+
+class FakeBlobServiceClient:
+    def __init__(self, store):
+        self._store = store
+        self.url = 'https://fake.blob.core.windows.net'
+
+    def get_container_client(self, container):
+        return FakeContainerClient(self._store, container)
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self._store, container, getattr(blob, 'name', blob))
+
+
+class FakeContainerClient:
+    def __init__(self, store, name):
+        self._store = store
+        self.container_name = name
+
+    def create_container(self, **kwargs):
+        self._store._request()
+        if self.container_name in self._store.containers:
+            raise ResourceExistsError("The specified container already exists.", 'ContainerAlreadyExists')
+        self._store.containers[self.container_name] = {}
+
+    def exists(self):
+        return self.container_name in self._store.containers
+
+    def list_blobs(self, name_starts_with=None, include=None, results_per_page=5000, **kwargs):
+        blobs = self._store.containers.get(self.container_name, {})
+        names = sorted(name for name in list(blobs) if name.startswith(name_starts_with or ''))
+        for start in range(0, max(len(names), 1), results_per_page):
+            # One request per listing page
+            self._store._request()
+            for name in names[start:start + results_per_page]:
+                blob = blobs.get(name)
+                if blob is not None:
+                    yield _properties(self.container_name, name, blob)
+
+    def walk_blobs(self, name_starts_with=None, include=None, delimiter='/', **kwargs):
+        """One level of the hierarchy: blobs, then prefixes (names ending in `delimiter`)."""
+        prefix = name_starts_with or ''
+        blobs, prefixes = [], set()
+        for item in self.list_blobs(name_starts_with=prefix, include=include):
+            head, separator, _ = item.name[len(prefix):].partition(delimiter)
+            if separator:
+                prefixes.add(prefix + head + separator)
+            else:
+                blobs.append(item)
+        yield from blobs
+        for name in sorted(prefixes):
+            yield FakeBlobProperties(name=name, prefix=name)
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self._store, self.container_name, getattr(blob, 'name', blob))
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        client = self.get_blob_client(name)
+        client.upload_blob(data, overwrite=overwrite, **kwargs)
+        return client
+
+    def download_blob(self, blob, **kwargs):
+        return self.get_blob_client(blob).download_blob(**kwargs)
+
+
+def _properties(container, name, blob):
+    return FakeBlobProperties(
+        name=name,
+        container=container,
+        size=len(blob.data),
+        etag=blob.etag,
+        last_modified=blob.last_modified,
+        metadata=dict(blob.metadata),
+        tags=dict(blob.tags),
+        content_settings=FakeBlobProperties(content_md5=blob.content_md5),
+        copy=FakeBlobProperties(id=blob.copy_id, status=blob.copy_status()),
+    )
+
+
+class FakeDownloader:
+    def __init__(self, store, data, chunk_size=4 * 1024 * 1024):
+        self._store = store
+        self._data = data
+        self._chunk_size = chunk_size
+        self.size = len(data)
+
+    def readall(self):
+        self._store._request(downloaded=len(self._data))
+        return self._data
+
+    def chunks(self):
+        for start in range(0, len(self._data), self._chunk_size):
+            chunk = self._data[start:start + self._chunk_size]
+            self._store._request(downloaded=len(chunk))
+            yield chunk
+
+    def readinto(self, stream):
+        for chunk in self.chunks():
+            stream.write(chunk)
+        return len(self._data)
+
+
+class FakeBlobClient:
+    def __init__(self, store, container, name):
+        self._store = store
+        self.container_name = container
+        self.blob_name = name
+        self.url = f"https://fake.blob.core.windows.net/{container}/{name}"
+
+    def _container(self):
+        return self._store.containers.setdefault(self.container_name, {})
+
+    def _blob(self):
+        try:
+            return self._container()[self.blob_name]
+        except KeyError:
+            raise ResourceNotFoundError(f"{self.container_name}/{self.blob_name} not found")
+
+    def exists(self):
+        self._store._request()
+        return self.blob_name in self._container()
+
+    def get_blob_properties(self):
+        self._store._request()
+        return _properties(self.container_name, self.blob_name, self._blob())
+
+    def download_blob(self, **kwargs):
+        return FakeDownloader(self._store, self._blob().data)
+
+    def upload_blob(self, data, overwrite=False, metadata=None, **kwargs):
+        if hasattr(data, 'read'):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not overwrite and self.blob_name in self._container():
+            raise ResourceExistsError("The specified blob already exists.", 'BlobAlreadyExists')
+        self._store._request(uploaded=len(data))
+        if self._store.discard_uploads:
+            data = b''
+        self._container()[self.blob_name] = _Blob(data, metadata)
+        return {'etag': self._container()[self.blob_name].etag}
+
+    def stage_block(self, block_id, data, **kwargs):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._store._request(uploaded=len(data))
+        with self._store._lock:
+            staged = self._store.__dict__.setdefault('_staged', {})
+            staged[(self.container_name, self.blob_name, block_id)] = b'' if self._store.discard_uploads else bytes(data)
+
+    def commit_block_list(self, block_list, metadata=None, **kwargs):
+        self._store._request()
+        staged = self._store.__dict__.setdefault('_staged', {})
+        data = b''.join(staged.pop((self.container_name, self.blob_name, getattr(block, 'id', block)))
+                        for block in block_list)
+        self._container()[self.blob_name] = _Blob(data, metadata)
+        return {'etag': self._container()[self.blob_name].etag}
+
+    def set_blob_metadata(self, metadata=None, **kwargs):
+        self._store._request()
+        self._blob().metadata = dict(metadata or {})
+
+    def set_blob_tags(self, tags=None, **kwargs):
+        self._store._request()
+        self._blob().tags = dict(tags or {})
+
+    def delete_blob(self, **kwargs):
+        self._store._request()
+        self._blob()
+        del self._container()[self.blob_name]
+
+    def start_copy_from_url(self, source_url, metadata=None, **kwargs):
+        self._store._request()
+        container, name = source_url.split('.net/', 1)[1].split('/', 1)
+        source = self._store.containers[container][name]
+        current = self._container().get(self.blob_name)
+        if current is not None and current.copy_status() == 'pending':
+            raise ResourceExistsError("There is currently a pending copy operation.", 'PendingCopyOperation')
+        copy = _Blob(source.data, source.metadata if metadata is None else metadata)
+        copy.content_md5 = source.content_md5
+        copy.copy_id = copy.etag
+        copy.copy_completes_at = time.monotonic() + self._store.copy_latency
+        self._container()[self.blob_name] = copy
+        return {'copy_status': copy.copy_status(), 'copy_id': copy.copy_id}
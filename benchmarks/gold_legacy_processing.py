@@ -0,0 +1,136 @@
+"""GoldLevel's per-dataset processing functions from before the harmonisation rules.
+
+Kept verbatim for bench_gold_harmonisation.py, which checks the rules reproduce
+their output exactly and compares time and memory.
+"""
+
+
+# Define your file-specific processing functions here
+
+def process_bmx_file(year,data):
+    # Apply transformations for BMX file
+    return data[['SEQN','BMXBMI','BMXLEG','BMXWAIST','BMXWT','BMXHT','BMXARMC','BMXARML']]
+
+def process_dbq_file(year,data):
+    # Apply transformations for DBQ file
+    if year in ['1999-2000', '2001-2002', '2003-2004']:
+        data = data[['SEQN','DBD090']]
+        data.rename(columns={'DBD090':'DBD895'}, inplace=True)
+        data['DBD910'] = None
+        data['DBD905'] = None
+    elif year in ['2005-2006']:
+        data = data[['SEQN','DBD091']]
+        data.rename(columns={'DBD091':'DBD895'}, inplace=True)
+        data['DBD910'] = None
+        data['DBD905'] = None
+    else:
+        data = data[['SEQN','DBD895','DBD905','DBD910']]
+    return data
+
+
+
+def process_demo_file(year,data):
+    # Apply transformations for DEMO file
+    if year in ['1999-2000', '2001-2002']:
+        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR']]
+        #adding columns FIALANG,AIALANGA ,SIALANG,MIALANG with value null
+        data['FIALANG'] = None
+        data['AIALANG'] = None
+        data['SIALANG'] = None
+        data['MIALANG'] = None
+
+    elif year in ['2003-2004','2005-2006']:
+        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
+    
+    elif year in ['2007-2008','2009-2010']:
+         data.rename(columns={'DMDBORN2':'DMDBORN'}, inplace=True)
+         data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
+   
+    elif year in ['2011-2012','2013-2014','2015-2016']:
+        #rename DMDBORN4 to DMDBORN
+        data.rename(columns={'DMDBORN4':'DMDBORN'}, inplace=True)
+        #rename AIALANGA to AIALANG
+        data.rename(columns={'AIALANGA':'AIALANG'}, inplace=True)
+        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
+    else:
+        #rename DMDBORN4 to DMDBORN
+        data.rename(columns={'DMDBORN4':'DMDBORN'}, inplace=True)
+        #rename AIALANGA to AIALANG
+        data.rename(columns={'AIALANGA':'AIALANG'}, inplace=True)
+        #rename DMDMARTZ to DMDMARTL
+        data.rename(columns={'DMDMARTZ':'DMDMARTL'}, inplace=True)
+        data = data[['SEQN','RIAGENDR','RIDAGEYR','RIDEXMON','RIDRETH1','DMDBORN','DMDEDUC2','DMDMARTL','INDFMPIR','FIALANG','AIALANG','SIALANG','MIALANG']]
+    return data
+
+def process_ohq_file(year,data):
+    # Apply transformations for OHQ file
+    data = data[['SEQN','OHQ033']]
+    return data
+
+def process_slq_file(year,data):
+    # Apply transformations for SLQ file
+    if year in ['1999-2000', '2001-2002', '2003-2004','2015-2016','2017-2020']:        
+        data = data[['SEQN','SLD012']]
+    else: 
+        #rename SLD010H to SLD012
+        data.rename(columns={'SLD010H':'SLD012'}, inplace=True)
+        data = data[['SEQN','SLD012']]
+    return data
+
+def process_smq_file(year,data):
+    return data[['SEQN', 'SMQ020']]
+
+def process_smqfam_file(year,data):
+    if year in ['1999-2000','2001-2002','2003-2004','2005-2006','2007-2008','2009-2010','2011-2012']:
+        #rename SMD415 to SMD460
+        data.rename(columns={'SMD415':'SMD460'}, inplace=True)
+        data = data[['SEQN','SMD460']]
+    else:
+        data = data[['SEQN','SMD460']]
+    return data
+
+
+def process_smqrtu_file(year,data):
+    if year in ['2005-2006','2007-2008','2009-2010','2011-2012']:
+        #rename SMQ690D to SMQ851
+        data.rename(columns={'SMQ690D':'SMQ851'}, inplace=True)
+        #rename SMQ680 to SMDANY
+        data.rename(columns={'SMQ680':'SMDANY'}, inplace=True)
+        #duplicate SMDANY and rename this new column to SMQ681
+        data['SMQ681'] = data['SMDANY']
+        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
+    else:
+        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
+    return data
+
+def process_smqmec_file(year,data):
+    if year in ['1999-2000']:
+        #rename SMD690D to SMQ851
+        data.rename(columns={'SMD690D':'SMQ851'}, inplace=True)
+        #rename SMD680 to SMDANY
+        data.rename(columns={'SMD680':'SMDANY'}, inplace=True)
+        #duplicate SMDANY and rename this new column to SMQ681
+        data['SMQ681'] = data['SMDANY']
+        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
+    elif year in ['2001-2002','2003-2004']:
+        #rename SMD690D to SMQ851
+        data.rename(columns={'SMQ690D':'SMQ851'}, inplace=True)
+        #rename SMD680 to SMDANY
+        data.rename(columns={'SMQ680':'SMDANY'}, inplace=True)
+        #duplicate SMDANY and rename this new column to SMQ681
+        data['SMQ681'] = data['SMDANY']
+        data = data[['SEQN','SMQ851','SMDANY','SMQ681']]
+
+    return data
+
+def process_whq_file(year,data):
+    if year in ['1999-2000']:
+        #rename WHD150 to WHQ150
+        data.rename(columns={'WHD150':'WHQ150'}, inplace=True)
+        data = data[['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010']]
+    else:
+        data = data[['SEQN','WHQ150','WHD140','WHD050','WHD020','WHD010']]
+    return data
+
+def process_cot_file(year,data):
+    return data[['SEQN', 'LBXCOT']]         
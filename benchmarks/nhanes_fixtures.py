@@ -0,0 +1,124 @@
+"""Synthetic NHANES-shaped datasets for the pipeline benchmarks.
+
+Each (cycle, dataset) frame uses the variable names that cycle actually
+published, so GoldLevel's year-specific renames are all exercised, plus a
+number of filler columns that GoldLevel does not select. Values are small
+integer codes, or continuous measurements for the variables that are
+measurements, with some missing values, like the real files.
+"""
+import numpy as np
+import pandas as pd
+
+YEARS = ['1999-2000', '2001-2002', '2003-2004', '2005-2006', '2007-2008',
+         '2009-2010', '2011-2012', '2013-2014', '2015-2016', '2017-2020']
+# NHANES file name suffix of each cycle: DEMO.XPT, DEMO_B.XPT, ... DEMO_J.XPT
+SUFFIXES = dict(zip(YEARS, ['', '_B', '_C', '_D', '_E', '_F', '_G', '_H', '_I', '_J']))
+DATASETS = ['BMX', 'DBQ', 'DEMO', 'OHQ', 'SLQ', 'SMQ', 'SMQFAM', 'SMQRTU', 'SMQMEC', 'WHQ', 'COT']
+# Participants per cycle in the real survey
+PARTICIPANTS = 10000
+# Selected variables that are measurements rather than coded answers or counts
+MEASUREMENTS = {'BMXBMI', 'BMXLEG', 'BMXWAIST', 'BMXWT', 'BMXHT', 'BMXARMC', 'BMXARML',
+                'INDFMPIR', 'SLD012', 'SLD010H', 'LBXCOT'}
+
+
+def _index(year):
+    return YEARS.index(year)
+
+
+def dataset_columns(dataset, year):
+    """Source variable names of `dataset` in cycle `year`, or None if the cycle has no such file."""
+    i = _index(year)
+    if dataset == 'BMX':
+        return ['BMXBMI', 'BMXLEG', 'BMXWAIST', 'BMXWT', 'BMXHT', 'BMXARMC', 'BMXARML']
+    if dataset == 'DBQ':
+        if i <= 2:
+            return ['DBD090']
+        if i == 3:
+            return ['DBD091']
+        return ['DBD895', 'DBD905', 'DBD910']
+    if dataset == 'DEMO':
+        base = ['RIAGENDR', 'RIDAGEYR', 'RIDEXMON', 'RIDRETH1', 'DMDEDUC2', 'DMDMARTL', 'INDFMPIR']
+        languages = ['FIALANG', 'AIALANG', 'SIALANG', 'MIALANG']
+        if i <= 1:
+            return base + ['DMDBORN']
+        if i <= 3:
+            return base + ['DMDBORN'] + languages
+        if i <= 5:
+            return base + ['DMDBORN2'] + languages
+        languages = ['FIALANG', 'AIALANGA', 'SIALANG', 'MIALANG']
+        if i <= 8:
+            return base + ['DMDBORN4'] + languages
+        return [c if c != 'DMDMARTL' else 'DMDMARTZ' for c in base] + ['DMDBORN4'] + languages
+    if dataset == 'OHQ':
+        return ['OHQ033']
+    if dataset == 'SLQ':
+        return ['SLD012'] if i <= 2 or i >= 8 else ['SLD010H']
+    if dataset == 'SMQ':
+        return ['SMQ020']
+    if dataset == 'SMQFAM':
+        return ['SMD415'] if i <= 6 else ['SMD460']
+    if dataset == 'SMQRTU':
+        if i <= 2:
+            return None
+        return ['SMQ690D', 'SMQ680'] if i <= 6 else ['SMQ851', 'SMDANY', 'SMQ681']
+    if dataset == 'SMQMEC':
+        if i == 0:
+            return ['SMD690D', 'SMD680']
+        return ['SMQ690D', 'SMQ680'] if i <= 2 else None
+    if dataset == 'WHQ':
+        return ['WHD150' if i == 0 else 'WHQ150', 'WHD140', 'WHD050', 'WHD020', 'WHD010']
+    if dataset == 'COT':
+        return ['LBXCOT']
+    raise ValueError(f"Unknown dataset {dataset}")
+
+
+def blob_name(dataset, year, extension='.csv'):
+    return f"{year}/{dataset}{SUFFIXES[year]}{extension}"
+
+
+def dataset_frame(dataset, year, participants=PARTICIPANTS, filler_columns=20, missing_rate=0.05, seed=0):
+    """Frame for one NHANES file, or None if the cycle did not publish it."""
+    columns = dataset_columns(dataset, year)
+    if columns is None:
+        return None
+    i = _index(year)
+    rng = np.random.default_rng([seed, i, DATASETS.index(dataset)])
+    first_seqn = 1 + i * participants * 2
+    # Not every participant answers every component
+    seqn = np.arange(first_seqn, first_seqn + participants, dtype='f8')
+    seqn = seqn[rng.random(participants) < 0.95]
+    rows = len(seqn)
+
+    data = {'SEQN': seqn}
+    names = columns + [f"{dataset[:3]}X{n:03d}" for n in range(filler_columns)]
+    for n, name in enumerate(names):
+        # Filler columns alternate between the two kinds
+        if name in MEASUREMENTS or (name not in columns and n % 3 == 0):
+            values = np.round(rng.normal(50, 15, rows), 1)
+        else:
+            values = rng.integers(1, 10, rows).astype('f8')
+        values[rng.random(rows) < missing_rate] = np.nan
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+def silver_layer(years=YEARS, participants=PARTICIPANTS, filler_columns=20, seed=0):
+    """Yield (blob_name, frame) for every file of every cycle."""
+    for year in years:
+        for dataset in DATASETS:
+            frame = dataset_frame(dataset, year, participants, filler_columns, seed=seed)
+            if frame is not None:
+                yield blob_name(dataset, year), frame
+
+
+def load_silver_layer(store, table_format='csv', container='silver-level', **kwargs):
+    """Write the synthetic silver layer into a FakeBlobStore; return the bytes written."""
+    from shared_code import table_format as formats
+
+    total = 0
+    extension = formats.FILE_EXTENSIONS[table_format]
+    for name, frame in silver_layer(**kwargs):
+        data = formats.table_bytes(frame, table_format)
+        store.put(container, name.rsplit('.', 1)[0] + extension, data)
+        total += len(data)
+    return total
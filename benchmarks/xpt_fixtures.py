@@ -0,0 +1,135 @@
+"""Synthetic SAS XPORT (v5 and v8) files for the benchmarks.
+
+pandas can read XPORT but not write it, so this is a minimal writer: numeric
+columns are stored as 8-byte IBM floats and character columns as fixed-width,
+blank-padded bytes. That is enough to produce NHANES-shaped files of any size.
+"""
+import io
+import struct
+import numpy as np
+import pandas as pd
+
+# Record names per version: library, member, descriptor, namestr, observations
+_RECORD_NAMES = {
+    5: ("LIBRARY ", "MEMBER  ", "DSCRPTR ", "NAMESTR ", "OBS     "),
+    8: ("LIBV8   ", "MEMBV8  ", "DSCPTV8 ", "NAMSTV8 ", "OBSV8   "),
+}
+_TIMESTAMP = "01JAN20:00:00:00"
+_NAMESTR = {
+    5: struct.Struct(">hhhh8s40s8shhh2s8shhl52s"),
+    8: struct.Struct(">hhhh8s40s8shhh2s8shhl32sh18s"),
+}
+
+
+def ieee_to_ibm(values):
+    """Encode float64 values as big-endian 8-byte IBM floats. NaN becomes the SAS '.' missing code."""
+    values = np.asarray(values, dtype='f8')
+    out = np.zeros(len(values), dtype='>u8')
+    missing = np.isnan(values)
+    nonzero = ~missing & (values != 0)
+
+    x = values[nonzero]
+    sign = (x < 0).astype('u8') << np.uint64(63)
+    fraction, exponent2 = np.frexp(np.abs(x))
+    # |x| = m * 16**e with 1/16 <= m < 1
+    exponent16 = -((-exponent2) // 4)
+    mantissa = np.ldexp(fraction, exponent2 - 4 * exponent16 + 56).astype('u8')
+    out[nonzero] = sign | ((exponent16 + 64).astype('u8') << np.uint64(56)) | mantissa
+    out[missing] = np.uint64(0x2E) << np.uint64(56)
+    return out
+
+
+def _pad(text, length):
+    return text.encode('ascii').ljust(length, b' ')[:length]
+
+
+def _record(text):
+    assert len(text) == 80
+    return text.encode('ascii')
+
+
+def _header(name, tail="000000000000000000000000000000  "):
+    return _record(f"HEADER RECORD*******{name}HEADER RECORD!!!!!!!{tail}")
+
+
+def write_xpt(df, stream, dataset_name='DATA', version=5, numeric_width=8):
+    """Write `df` to `stream` as a single-member XPORT file.
+
+    `version` 8 allows names up to 32 characters. `numeric_width` below 8
+    writes truncated floats, as some older SAS exports do.
+    """
+    library, member, descriptor, namestr, obs = _RECORD_NAMES[version]
+    name_width = 8 if version == 5 else 32
+    is_char = [not pd.api.types.is_numeric_dtype(df[column]) for column in df.columns]
+    widths = []
+    for column, char in zip(df.columns, is_char):
+        if char:
+            width = max(1, int(df[column].astype(str).str.len().max() or 1))
+            widths.append(width)
+        else:
+            widths.append(numeric_width)
+
+    stream.write(_header(library))
+    stream.write(_record("SAS     SAS     SASLIB  9.4     X64_10  " + " " * 24 + _TIMESTAMP))
+    stream.write(_record(_TIMESTAMP + " " * 64))
+    stream.write(_header(member, "000000000000000001600000000140  "))
+    stream.write(_header(descriptor))
+    stream.write(_record("SAS     " + dataset_name.ljust(name_width)[:name_width] + "SASDATA 9.4     X64_10  "
+                         + " " * (32 - name_width) + _TIMESTAMP))
+    stream.write(_record(_TIMESTAMP + " " * 16 + dataset_name.ljust(40)[:40] + " " * 8))
+    if version == 5:
+        stream.write(_header(namestr, f"000000{len(df.columns):04d}00000000000000000000  "))
+    else:
+        stream.write(_header(namestr, f"000000{len(df.columns):6d}000000000000000000  "))
+
+    namestrs = bytearray()
+    position = 0
+    for number, (column, width) in enumerate(zip(df.columns, widths), start=1):
+        ntype = 2 if is_char[number - 1] else 1
+        fields = [ntype, 0, width, number, _pad(column, 8), _pad(column, 40),
+                  b' ' * 8, 0, 0, 0, b'  ', b' ' * 8, 0, 0, position]
+        if version == 5:
+            fields.append(b'\0' * 52)
+        else:
+            fields += [_pad(column, 32), 0, b'\0' * 18]
+        namestrs += _NAMESTR[version].pack(*fields)
+        position += width
+    if len(namestrs) % 80:
+        namestrs += b' ' * (80 - len(namestrs) % 80)
+    stream.write(bytes(namestrs))
+    stream.write(_header(obs))
+
+    # Build the observation area column by column as a fixed-width record array
+    dtype = np.dtype([(f"s{i}", f"S{width}") for i, width in enumerate(widths)])
+    records = np.empty(len(df), dtype=dtype)
+    for i, column in enumerate(df.columns):
+        if not is_char[i]:
+            # Truncated floats keep the high-order bytes
+            encoded = ieee_to_ibm(df[column].to_numpy(dtype='f8')).view('S8')
+            records[f"s{i}"] = encoded.astype(f"S{widths[i]}") if widths[i] < 8 else encoded
+        else:
+            records[f"s{i}"] = [_pad(value, widths[i]) for value in df[column].fillna('').astype(str)]
+    observations = records.tobytes()
+    if len(observations) % 80:
+        observations += b' ' * (80 - len(observations) % 80)
+    stream.write(observations)
+
+
+def xpt_bytes(df, dataset_name='DATA', **kwargs):
+    buffer = io.BytesIO()
+    write_xpt(df, buffer, dataset_name, **kwargs)
+    return buffer.getvalue()
+
+
+def synthetic_frame(rows, columns, seed=0, missing_rate=0.05, first_seqn=1):
+    """NHANES-shaped frame: a SEQN key plus small coded/continuous numeric columns."""
+    rng = np.random.default_rng(seed)
+    data = {'SEQN': np.arange(first_seqn, first_seqn + rows, dtype='f8')}
+    for i in range(columns):
+        if i % 2:
+            values = rng.integers(1, 10, rows).astype('f8')
+        else:
+            values = np.round(rng.normal(50, 15, rows), 2)
+        values[rng.random(rows) < missing_rate] = np.nan
+        data[f"VAR{i:03d}"] = values
+    return pd.DataFrame(data)
@@ -0,0 +1,3 @@
+# Code shared between the functions in this app.
+# The function app root is on sys.path, so functions import from here with
+# `from shared_code import <module>`.
@@ -0,0 +1,102 @@
+import collections
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage.blob import BlobBlock
+
+# Azure allows blocks up to 4000 MiB, but small blocks keep the write buffer
+# (and therefore peak memory) bounded. 4 MiB is the SDK's own default.
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class BlockBlobWriter:
+    """Write-only file-like object that uploads to a block blob in stages.
+
+    Data is buffered until `block_size` bytes are available, then sent with
+    `stage_block`. Nothing is visible in the container until `close()` commits
+    the block list, so a failed conversion never leaves a half-written blob
+    behind (uncommitted blocks are garbage collected by the service).
+
+    With `max_concurrency` > 1, up to that many blocks are staged at once in
+    background threads while the caller keeps writing; at most
+    `max_concurrency` full blocks are held in memory.
+    """
+
+    def __init__(self, blob_client, block_size=DEFAULT_BLOCK_SIZE, content_settings=None, encoding='utf-8',
+                 max_concurrency=1):
+        self._blob_client = blob_client
+        self._block_size = block_size
+        self._content_settings = content_settings
+        self._encoding = encoding
+        self._buffer = bytearray()
+        self._blocks = []
+        self._max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_concurrency) if max_concurrency > 1 else None
+        self._in_flight = collections.deque()
+        # Block ids must all have the same length within a blob
+        self._block_prefix = uuid.uuid4().hex
+        self.bytes_written = 0
+        self.closed = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode(self._encoding)
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self._block_size:
+            self._stage(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def flush(self):
+        # Blocks are only staged once full; flushing early would just create
+        # lots of small blocks.
+        pass
+
+    def _stage(self, block_data):
+        block_id = f"{self._block_prefix}-{len(self._blocks):08d}"
+        # The block list keeps the write order, whatever order the blocks are staged in
+        self._blocks.append(BlobBlock(block_id=block_id))
+        if self._pool is None:
+            self._blob_client.stage_block(block_id=block_id, data=block_data, length=len(block_data))
+            return
+        while len(self._in_flight) >= self._max_concurrency:
+            self._in_flight.popleft().result()
+        self._in_flight.append(self._pool.submit(
+            self._blob_client.stage_block, block_id=block_id, data=block_data, length=len(block_data)))
+
+    def _shutdown(self, cancel):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=cancel)
+            self._pool = None
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._stage(bytes(self._buffer))
+                self._buffer.clear()
+            # Every block must be staged before the list is committed; raises the first failure
+            while self._in_flight:
+                self._in_flight.popleft().result()
+        except BaseException:
+            self._shutdown(cancel=True)
+            raise
+        self._shutdown(cancel=False)
+        self._blob_client.commit_block_list(self._blocks, content_settings=self._content_settings)
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only commit on success; on error the staged blocks are abandoned
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown(cancel=True)
+            self.closed = True
+        return False
@@ -0,0 +1,94 @@
+"""Storage and Azure ML clients shared by every invocation in a worker process.
+
+Creating a client per invocation pays for credential discovery, a token
+request and new TLS connections every time. The clients here are created on
+first use and kept for CLIENT_MAX_AGE_SECONDS, so warm invocations reuse the
+pooled HTTP connections and the credential's cached token. Clients are
+thread-safe, so concurrent invocations share them.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient
+from urllib3.util.retry import Retry
+
+from shared_code import parallel
+
+try:
+    # azure-core's adapter, which uses larger socket buffers for uploads
+    from azure.core.pipeline.transport._requests_basic import BiggerBlockSizeHTTPAdapter as _HTTPAdapter
+except ImportError:
+    from requests.adapters import HTTPAdapter as _HTTPAdapter
+
+# Open HTTP connections kept per host. requests keeps 10 by default, fewer than the
+# concurrent requests some functions make (e.g. SILVER_MAX_CONCURRENCY).
+POOL_SIZE = parallel.setting('CLIENT_POOL_SIZE', 32)
+# Cached clients are re-created after this many seconds (0 keeps them for the life of the worker)
+MAX_AGE_SECONDS = parallel.setting('CLIENT_MAX_AGE_SECONDS', 1800)
+
+_lock = threading.RLock()
+_clients = {}  # key -> (client, created at)
+
+
+def _cached(key, create):
+    with _lock:
+        entry = _clients.get(key)
+        if entry is not None and (not MAX_AGE_SECONDS or time.monotonic() - entry[1] < MAX_AGE_SECONDS):
+            return entry[0]
+        # Invocations still using an expired client keep it until they finish
+        client = create()
+        _clients[key] = (client, time.monotonic())
+        return client
+
+
+def _transport():
+    session = requests.Session()
+    # The pipeline's retry policy handles retries, as in azure-core's own session setup
+    adapter = _HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                           max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+
+def blob_service_client(connection_string=None):
+    """BlobServiceClient for `connection_string` (default: the AzureWebJobsStorage setting)."""
+    connection_string = connection_string or os.environ['AzureWebJobsStorage']
+    return _cached(('blob', connection_string),
+                   lambda: BlobServiceClient.from_connection_string(connection_string, transport=_transport()))
+
+
+def credential():
+    """DefaultAzureCredential; it caches its access tokens and refreshes them before they expire."""
+    from azure.identity import DefaultAzureCredential
+
+    return _cached(('credential',), DefaultAzureCredential)
+
+
+def ml_client(subscription_id, resource_group, workspace_name):
+    from azure.ai.ml import MLClient
+
+    return _cached(('ml', subscription_id, resource_group, workspace_name),
+                   lambda: MLClient(credential(), subscription_id, resource_group, workspace_name))
+
+
+def reset():
+    """Drop every cached client; the next call creates new ones."""
+    with _lock:
+        _clients.clear()
+
+
+def reset_on_connection_error(error):
+    """Drop the cached clients if `error` means the connection itself failed (DNS, TLS, socket).
+
+    Dead idle connections are already replaced by the connection pool; this
+    covers failures that a fresh client might not hit, e.g. a stale endpoint.
+    """
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        logging.warning(f"Resetting cached clients after a connection error: {error}")
+        reset()
@@ -0,0 +1,95 @@
+"""The NHANES datasets and survey cycles the pipeline uses, and blob name classification.
+
+Blobs are named `<cycle>/<FILE>` where FILE is the NHANES file name, e.g.
+`2003-2004/DEMO_C.csv`: the dataset code followed by an optional `_<letter>`
+cycle suffix and the extension. SilverLevel and GoldLevel both classify
+names with a DatasetCatalog so they agree on which files belong to the
+pipeline.
+"""
+import os
+from collections import namedtuple
+
+# Survey cycles, i.e. the top-level folders of each layer
+YEARS = ('1999-2000', '2001-2002', '2003-2004', '2005-2006', '2007-2008',
+         '2009-2010', '2011-2012', '2013-2014', '2015-2016', '2017-2020')
+
+# Dataset codes the pipeline uses
+DATASETS = ('BMX', 'DBQ', 'DEMO', 'COT', 'OHQ', 'SLQ', 'SMQ', 'SMQFAM', 'SMQMEC', 'SMQRTU', 'WHQ')
+
+# `year` is the blob's top-level folder (None at the container root); `processor` is whatever
+# the catalog was built with for the dataset
+DatasetFile = namedtuple('DatasetFile', ['blob_name', 'dataset', 'year', 'processor'])
+
+
+def dataset_code(file_name):
+    """Dataset code of an NHANES file name: `DEMO_C.csv` -> `DEMO`, `BMX.xpt` -> `BMX`."""
+    file_name = file_name.upper()
+    # Everything from the cycle suffix on, or from the extension if there is no suffix
+    end = file_name.find('_')
+    if end < 0:
+        end = file_name.find('.')
+    return file_name if end < 0 else file_name[:end]
+
+
+class DatasetCatalog:
+    """Classify blob names as pipeline datasets with one dictionary lookup each.
+
+    `processors` maps dataset codes to the value returned as `processor`
+    (e.g. GoldLevel's processing functions); by default every code in
+    DATASETS is accepted with processor None.
+    """
+
+    # File names repeat across cycles and runs, so their classification is remembered (up to a limit)
+    MAX_REMEMBERED_NAMES = 100_000
+
+    def __init__(self, processors=None):
+        if processors is None:
+            processors = dict.fromkeys(DATASETS)
+        unknown = set(processors) - set(DATASETS)
+        if unknown:
+            raise ValueError(f"Unknown dataset codes: {sorted(unknown)}")
+        self._processors = dict(processors)
+        # file name -> (dataset code, processor), or False for other files
+        self._file_names = {}
+
+    def __contains__(self, dataset):
+        return dataset in self._processors
+
+    def classify(self, blob_name):
+        """DatasetFile for `blob_name`, or None if it is not one of the catalog's datasets."""
+        folder, _, file_name = blob_name.rpartition('/')
+        entry = self._file_names.get(file_name)
+        if entry is None:
+            dataset = dataset_code(file_name)
+            entry = (dataset, self._processors[dataset]) if dataset in self._processors else False
+            if len(self._file_names) >= self.MAX_REMEMBERED_NAMES:
+                self._file_names.clear()
+            self._file_names[file_name] = entry
+        if not entry:
+            return None
+        return DatasetFile(blob_name, entry[0], folder.partition('/')[0] or None, entry[1])
+
+
+def select_files(dataset_files, preferred_extension=None):
+    """Keep one file per (year, dataset) of `dataset_files`, (DatasetFile, last_modified) pairs.
+
+    While a container is switched to another format a dataset can have a file
+    in each, e.g. `2003-2004/DEMO_C.csv` and `2003-2004/DEMO_C.parquet`: the
+    one with `preferred_extension` is kept, otherwise the most recently
+    modified one. Two files of one dataset with the same extension cannot be
+    told apart and raise a ValueError. Returns the kept DatasetFiles in order.
+    """
+    dataset_files = list(dataset_files)
+    candidates = {}
+    for dataset_file, last_modified in dataset_files:
+        candidates.setdefault((dataset_file.year, dataset_file.dataset), []).append((dataset_file, last_modified))
+    kept = set()
+    for (year, dataset), files in candidates.items():
+        extensions = [os.path.splitext(dataset_file.blob_name)[1].lower() for dataset_file, _ in files]
+        if len(set(extensions)) < len(extensions):
+            names = ', '.join(dataset_file.blob_name for dataset_file, _ in files)
+            raise ValueError(f"More than one {dataset} file in {year or 'the container root'}: {names}")
+        preferred = [dataset_file for (dataset_file, _), extension in zip(files, extensions)
+                     if extension == preferred_extension]
+        kept.add(preferred[0] if preferred else max(files, key=lambda item: item[1])[0])
+    return [dataset_file for dataset_file, _ in dataset_files if dataset_file in kept]
@@ -0,0 +1,105 @@
+"""Cache of DataFrames keyed by a fingerprint of the inputs they were built from.
+
+Entries are stored as Parquet, either as blobs in a cache container (with the
+fingerprint in the blob metadata) or as files in a local directory (with the
+fingerprint in a sidecar file). A lookup only returns a frame when the stored
+fingerprint matches, so a changed input simply misses and is rebuilt.
+"""
+import hashlib
+import io
+import json
+import os
+from azure.core.exceptions import ResourceNotFoundError
+
+from shared_code import lazy, table_format
+
+pd = lazy.module('pandas')
+
+FINGERPRINT_KEY = 'fingerprint'
+
+
+def fingerprint(*parts):
+    """Stable hash of JSON-serialisable `parts` (other values are converted with str)."""
+    encoded = json.dumps(parts, default=str, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _to_bytes(df):
+    return table_format.table_bytes(df, table_format.PARQUET)
+
+
+def _from_bytes(data):
+    return pd.read_parquet(io.BytesIO(data))
+
+
+class BlobFrameCache:
+    """Frames stored as `<key>.parquet` blobs in a cache container."""
+
+    def __init__(self, container_client):
+        self._container = container_client
+        self._fingerprints = None
+
+    def _index(self):
+        # One listing per invocation gives the fingerprints of every entry
+        if self._fingerprints is None:
+            try:
+                self._fingerprints = {
+                    blob.name: (blob.metadata or {}).get(FINGERPRINT_KEY)
+                    for blob in self._container.list_blobs(include=['metadata'])
+                }
+            except ResourceNotFoundError:
+                # The cache container is created by the first put
+                self._fingerprints = {}
+        return self._fingerprints
+
+    def get(self, key, expected_fingerprint):
+        name = f"{key}.parquet"
+        if self._index().get(name) != expected_fingerprint:
+            return None
+        data = self._container.get_blob_client(name).download_blob().readall()
+        return _from_bytes(data)
+
+    def put(self, key, entry_fingerprint, df):
+        name = f"{key}.parquet"
+        data = _to_bytes(df)
+        metadata = {FINGERPRINT_KEY: entry_fingerprint}
+        try:
+            self._container.get_blob_client(name).upload_blob(data, overwrite=True, metadata=metadata)
+        except ResourceNotFoundError:
+            self._container.create_container()
+            self._container.get_blob_client(name).upload_blob(data, overwrite=True, metadata=metadata)
+        self._index()[name] = entry_fingerprint
+
+
+class LocalFrameCache:
+    """Frames stored as `<key>.parquet` files in a local directory."""
+
+    def __init__(self, directory):
+        self._directory = directory
+
+    def _paths(self, key):
+        base = os.path.join(self._directory, key)
+        return base + '.parquet', base + '.fingerprint'
+
+    def get(self, key, expected_fingerprint):
+        data_path, fingerprint_path = self._paths(key)
+        try:
+            with open(fingerprint_path) as f:
+                if f.read() != expected_fingerprint:
+                    return None
+            with open(data_path, 'rb') as f:
+                return _from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, entry_fingerprint, df):
+        os.makedirs(self._directory, exist_ok=True)
+        data_path, fingerprint_path = self._paths(key)
+        # Invalidate first and write the fingerprint last, so a partly written entry is never a hit
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
+        for path, content, mode in ((data_path, _to_bytes(df), 'wb'), (fingerprint_path, entry_fingerprint, 'w')):
+            temporary = path + '.tmp'
+            with open(temporary, mode) as f:
+                f.write(content)
+            os.replace(temporary, path)
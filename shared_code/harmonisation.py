@@ -0,0 +1,127 @@
+"""Declarative harmonisation of dataset columns across survey cycles.
+
+NHANES renames variables between cycles. Each Rule says, for one dataset and
+a set of cycles, which columns the harmonised frame has (by their final
+names), which source columns are renamed to get them, and which columns are
+added as a copy of another column or as nulls. The rules are compiled once
+into a TransformPlan per (dataset, cycle), which selects and renames every
+column with a single take from the source frame and then appends the added
+columns (copies share the copied column's data until either is modified).
+An optional dtype schema, by output column name, gives the dtypes to read
+each source column as and the dtype of the null columns.
+"""
+from shared_code import datasets, lazy
+
+pd = lazy.module('pandas')
+
+
+def cycles(first, last):
+    """The survey cycles from `first` to `last`, inclusive."""
+    return datasets.YEARS[datasets.YEARS.index(first):datasets.YEARS.index(last) + 1]
+
+
+class Rule:
+    """Harmonisation of `dataset` in `years` (None: every cycle no other rule of the dataset lists).
+
+    `select` lists the output columns taken from the source frame, in
+    order, by their names after `renames` ({source name: output name}).
+    `add` appends {output name: selected column it copies, or None for nulls}.
+    `select=None` passes the source frame through unchanged.
+    """
+
+    def __init__(self, dataset, years, select, renames=None, add=None):
+        self.dataset = dataset
+        self.years = None if years is None else tuple(years)
+        self.select = None if select is None else list(select)
+        self.renames = dict(renames or {})
+        self.add = dict(add or {})
+
+
+class TransformPlan:
+    """Compiled Rule: the source columns to read and how to turn them into the output frame.
+
+    `source_dtypes` maps source column names to the dtypes of their output
+    columns in `dtypes`; None when there is no schema.
+    """
+
+    __slots__ = ('source_columns', 'source_dtypes', 'output_columns', '_names', '_add', '_null_dtypes')
+
+    def __init__(self, rule, dtypes=None):
+        if rule.select is None:
+            # Passed through, so the columns keep their names
+            self.source_columns = self.output_columns = None
+            self.source_dtypes = dict(dtypes) if dtypes else None
+            return
+        original_names = {output: source for source, output in rule.renames.items()}
+        self.source_columns = [original_names.get(name, name) for name in rule.select]
+        self.source_dtypes = None
+        if dtypes:
+            self.source_dtypes = {source: dtypes[name] for source, name in zip(self.source_columns, rule.select)
+                                  if name in dtypes}
+        self._names = list(rule.select)
+        self._add = list(rule.add.items())
+        # Null columns without a dtype hold None (object dtype)
+        self._null_dtypes = {name: (dtypes or {}).get(name) for name, source in self._add if source is None}
+        self.output_columns = self._names + [name for name, _ in self._add]
+        missing = [source for _, source in self._add if source is not None and source not in self._names]
+        if missing:
+            raise ValueError(f"{rule.dataset}: added columns copy unselected columns {missing}")
+
+    def apply(self, data):
+        if self.source_columns is None:
+            return data
+        # A new frame at every step rather than setting columns on the selection, which pandas
+        # before 3.0 would flag as setting on a copy
+        df = data[self.source_columns].set_axis(self._names, axis=1)
+        if not self._add:
+            return df
+        added = {}
+        for name, source in self._add:
+            if source is None and self._null_dtypes[name] is None:
+                added[name] = None
+            elif source is None:
+                added[name] = pd.Series(None, index=df.index, dtype=self._null_dtypes[name])
+            else:
+                added[name] = df[source]
+        return df.assign(**added)
+
+
+class Harmonisation:
+    """TransformPlans of every (dataset, cycle) covered by `rules`, with the optional `dtypes` schema."""
+
+    def __init__(self, rules, years=datasets.YEARS, dtypes=None):
+        self._plans = {}
+        defaults = {}
+        for rule in rules:
+            if rule.years is None:
+                if rule.dataset in defaults:
+                    raise ValueError(f"{rule.dataset} has more than one rule without years")
+                defaults[rule.dataset] = rule
+                continue
+            plan = TransformPlan(rule, dtypes)
+            for year in rule.years:
+                if (rule.dataset, year) in self._plans:
+                    raise ValueError(f"{rule.dataset} has more than one rule for {year}")
+                self._plans[(rule.dataset, year)] = plan
+        for dataset, rule in defaults.items():
+            plan = TransformPlan(rule, dtypes)
+            for year in years:
+                self._plans.setdefault((dataset, year), plan)
+        self.datasets = sorted({dataset for dataset, _ in self._plans})
+
+    def plan(self, dataset, year):
+        try:
+            return self._plans[(dataset, year)]
+        except KeyError:
+            raise ValueError(f"No harmonisation rule for {dataset} in {year}.") from None
+
+    def source_columns(self, dataset, year):
+        """Columns to read from the dataset's file for `year`; None for all of them."""
+        return self.plan(dataset, year).source_columns
+
+    def source_dtypes(self, dataset, year):
+        """Dtypes to read the dataset's columns for `year` as; None without a schema."""
+        return self.plan(dataset, year).source_dtypes
+
+    def apply(self, dataset, year, data):
+        return self.plan(dataset, year).apply(data)
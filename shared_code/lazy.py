@@ -0,0 +1,32 @@
+"""Deferred imports of heavy modules.
+
+The worker imports every function's module when it starts, so a top-level
+`import pandas` in one function slows the cold start of all of them.
+
+    pd = lazy.module('pandas')
+
+binds `pd` to a stand-in that imports pandas the first time one of its
+attributes is used, e.g. on the first call of a function that reads a table.
+"""
+import importlib
+
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        # Only called for names that are not set on the stand-in itself
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = 'imported' if self._module is not None else 'not imported yet'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def module(name):
+    """Stand-in for module `name` (which may be a submodule, e.g. 'pyarrow.parquet')."""
+    return _LazyModule(name)
@@ -0,0 +1,61 @@
+"""The gold-level manifest: a small JSON blob naming the latest train/test pair.
+
+GoldLevel uploads it in one request once both outputs are committed, so a
+reader sees either the previous pair or the new one, never a mix. It is the
+only blob that triggers TriggerMLPipeline, which therefore runs once per
+GoldLevel run and finds the latest pair without listing the container,
+however many historic outputs it holds.
+"""
+import json
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+MANIFEST_BLOB = '_manifest/latest.json'
+# One marker blob per run whose data assets are registered; outside the trigger's path
+REGISTERED_PREFIX = '_registered/'
+
+
+def write(container_client, run_id, train_blob, test_blob, **details):
+    """Point the manifest at a new train/test pair; `details` are stored alongside."""
+    manifest = {'run_id': run_id, 'train': train_blob, 'test': test_blob, **details}
+    container_client.get_blob_client(MANIFEST_BLOB).upload_blob(
+        json.dumps(manifest, indent=1), overwrite=True,
+        content_settings=ContentSettings(content_type='application/json'))
+    return manifest
+
+
+def parse(data):
+    manifest = json.loads(data)
+    missing = {'run_id', 'train', 'test'} - set(manifest)
+    if missing:
+        raise ValueError(f"Manifest is missing {', '.join(sorted(missing))}")
+    return manifest
+
+
+def read(container_client):
+    """The current manifest, or None before the first GoldLevel run that wrote one."""
+    try:
+        return parse(container_client.get_blob_client(MANIFEST_BLOB).download_blob().readall())
+    except ResourceNotFoundError:
+        return None
+
+
+def claim(container_client, run_id):
+    """True for the first caller to claim the registration of run `run_id`, False for any later one.
+
+    Creating the marker blob only succeeds if it does not exist yet, so
+    duplicate deliveries of the same trigger cannot both register.
+    """
+    try:
+        container_client.get_blob_client(f"{REGISTERED_PREFIX}{run_id}").upload_blob(b'', overwrite=False)
+        return True
+    except ResourceExistsError:
+        return False
+
+
+def release(container_client, run_id):
+    """Undo `claim` after a failed registration, so a retry of the trigger can register the run."""
+    try:
+        container_client.get_blob_client(f"{REGISTERED_PREFIX}{run_id}").delete_blob()
+    except ResourceNotFoundError:
+        pass
@@ -0,0 +1,73 @@
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from shared_code import telemetry
+
+# Concurrent storage requests per invocation. Kept below the SDK's default
+# HTTP connection pool size (10) and well inside storage account throttling.
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def setting(name, default):
+    """Integer app setting `name`, or `default` when unset."""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def download_and_parse(jobs, download, parse, max_concurrency=DEFAULT_MAX_CONCURRENCY, parse_pool=None,
+                       stage=None):
+    """Download and parse many blobs concurrently; return the parsed results in job order.
+
+    `jobs` is a sequence of `(source, parse_kwargs)` pairs. `download(source)`
+    returns the blob's bytes and runs in a pool of `max_concurrency` threads,
+    which also bounds how many downloaded blobs are held at once.
+    `parse(data, **parse_kwargs)` runs in the same thread as the download, so
+    one blob is parsed while others are still downloading; pandas and pyarrow
+    release the GIL for most of the parse. With a `parse_pool` (see
+    process_pool()), parsing runs in its processes instead, in which case
+    `parse` must be a picklable module-level function (e.g.
+    `table_format.read_table`). The caller owns the pool, so one pool can serve
+    every call of an invocation.
+
+    With a `stage`, each job is recorded as `<stage>.download` (bytes) and
+    `<stage>.parse` (rows) telemetry spans.
+    """
+    def run(job):
+        source, parse_kwargs = job
+        with telemetry.span(stage and f'{stage}.download', file=source) as span:
+            data = download(source)
+            span.record(bytes=len(data))
+        with telemetry.span(stage and f'{stage}.parse', file=source) as span:
+            if parse_pool is None:
+                result = parse(data, **parse_kwargs)
+            else:
+                result = parse_pool.submit(parse, data, **parse_kwargs).result()
+            span.record(rows=len(result))
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as downloads:
+        return list(downloads.map(_in_context(run), jobs))
+
+
+def process_pool(processes):
+    """ProcessPoolExecutor of `processes` workers for CPU-bound work.
+
+    Workers are spawned rather than forked: a forked child would inherit the
+    functions host's gRPC threads and this process's open connections.
+    """
+    return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+
+
+def thread_map(function, items, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """`map` over a bounded thread pool, for I/O such as listing blobs; results in order."""
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        return list(pool.map(_in_context(function), items))
+
+
+def _in_context(function):
+    # Run each call in a copy of the caller's context, so telemetry spans opened
+    # in the pool threads belong to the caller's invocation
+    context = contextvars.copy_context()
+    return lambda item: context.copy().run(function, item)
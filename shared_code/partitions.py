@@ -0,0 +1,138 @@
+"""A DataFrame kept on local disk in partitions, for frames larger than memory.
+
+GoldLevel's out-of-core build appends each year's frame as a partition and
+then streams the train/test outputs from them. Every partition is written
+to its own uncompressed Arrow IPC file and memory-mapped when it is read, so
+only the chunk being processed is copied into memory. Reading a chunk gives
+the columns and dtypes that concatenating all the partitions with pd.concat
+would give, without ever building that frame.
+
+    with partitions.SpilledFrame(directory) as spilled:
+        for df in frames:
+            spilled.append(df)
+        for chunk in spilled.chunks(50000):
+            ...
+"""
+import os
+import shutil
+import tempfile
+
+from shared_code import lazy
+
+np = lazy.module('numpy')
+pd = lazy.module('pandas')
+pa = lazy.module('pyarrow')
+
+# Rows per Arrow record batch in the partition files
+BATCH_ROWS = 50000
+
+
+class SpilledFrame:
+    """Partitions appended in order, stored under a new temporary folder in `directory`."""
+
+    def __init__(self, directory=None, batch_rows=BATCH_ROWS):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._directory = tempfile.mkdtemp(prefix='spill-', dir=directory)
+        self._batch_rows = batch_rows
+        self._paths = []
+        self._lengths = []
+        # A frame with no rows per partition: concatenated, they give the columns and dtypes
+        self._heads = []
+        self._schema = None
+        # Arrow types of each column in the partitions, to tell what an object column holds
+        self._arrow_types = {}
+        self.bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return sum(self._lengths)
+
+    def append(self, df):
+        """Write `df` as the next partition, which the caller can then drop; returns its size in bytes."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = os.path.join(self._directory, f"{len(self._paths):05d}.arrow")
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=self._batch_rows)
+        size = os.path.getsize(path)
+        self.bytes_written += size
+        self._paths.append(path)
+        self._lengths.append(len(df))
+        self._heads.append(df.iloc[:0])
+        self._schema = None
+        for field in table.schema:
+            self._arrow_types.setdefault(field.name, set()).add(field.type)
+        return size
+
+    @property
+    def schema(self):
+        """Frame with no rows and the columns and dtypes of all partitions concatenated."""
+        if self._schema is None:
+            self._schema = pd.concat(self._heads, axis=0) if self._heads else pd.DataFrame()
+        return self._schema
+
+    @property
+    def columns(self):
+        return self.schema.columns
+
+    @property
+    def value_types(self):
+        """{column: Arrow type of its values in all partitions}, for table_format.parquet_schema."""
+        value_types = {}
+        for name, types in self._arrow_types.items():
+            types = [pa.schema([(name, value_type)]) for value_type in types if not pa.types.is_null(value_type)]
+            if types:
+                value_types[name] = pa.unify_schemas(types, promote_options='permissive').field(name).type
+        return value_types
+
+    def _table(self, partition):
+        # Memory-mapped: record batches are read from the page cache without copies
+        return pa.ipc.open_file(pa.memory_map(self._paths[partition])).read_all()
+
+    def _conform(self, df):
+        # Missing columns become nulls and every column gets the concatenated dtype
+        schema = self.schema
+        if not df.columns.equals(schema.columns):
+            df = df.reindex(columns=schema.columns)
+        changed = {column: dtype for column, dtype in schema.dtypes.items() if df[column].dtype != dtype}
+        return df.astype(changed) if changed else df
+
+    def chunks(self, rows):
+        """Yield the rows in order, at most `rows` at a time (a chunk never spans two partitions)."""
+        for partition, length in enumerate(self._lengths):
+            if not length:
+                continue
+            table = self._table(partition)
+            for start in range(0, length, rows):
+                yield self._conform(table.slice(start, rows).to_pandas())
+            del table
+
+    def take(self, positions, rows):
+        """Yield the rows at `positions` (as in df.iloc[positions] of the concatenated frame), `rows` at a time."""
+        tables = [self._table(partition) for partition in range(len(self._paths))]
+        bounds = np.cumsum([0] + self._lengths)
+        for start in range(0, len(positions), rows):
+            selected = np.asarray(positions[start:start + rows])
+            partition_of = np.searchsorted(bounds, selected, side='right') - 1
+            pieces, order = [], []
+            for partition in np.unique(partition_of):
+                in_partition = np.flatnonzero(partition_of == partition)
+                local = selected[in_partition] - bounds[partition]
+                pieces.append(self._conform(tables[partition].take(local).to_pandas()))
+                order.append(in_partition)
+            chunk = pd.concat(pieces, axis=0, ignore_index=True) if len(pieces) > 1 else pieces[0]
+            if len(pieces) > 1:
+                # Back in the order of `positions`
+                chunk = chunk.iloc[np.argsort(np.concatenate(order), kind='stable')]
+            yield chunk
+
+    def close(self):
+        shutil.rmtree(self._directory, ignore_errors=True)
+        self._paths, self._lengths, self._heads = [], [], []
+        self._schema = None
+        self._arrow_types = {}
@@ -0,0 +1,141 @@
+"""Server-side promotion of blobs from one container to another.
+
+Both containers are listed one top-level folder (e.g. one survey cycle) at a
+time, concurrently. A blob is only copied when the target is missing or out
+of date: every copy records the source ETag in the target's metadata, and a
+target whose recorded ETag or content MD5 matches the source is skipped, so a
+rerun over an unchanged container costs only the listings. Copies are started
+concurrently and run asynchronously on the storage service; pending copies
+are polled until they finish or the timeout passes, and a later run picks up
+whatever was still pending.
+"""
+import logging
+import time
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from shared_code import parallel
+
+# Target metadata key holding the ETag of the source blob it was copied from
+SOURCE_ETAG_KEY = 'source_etag'
+LIST_INCLUDE = ['metadata', 'copy']
+DELIMITER = '/'
+
+COPIED = 'copied'
+SKIPPED = 'skipped'
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+def list_partitioned(container_client, prefixes=None, max_concurrency=parallel.DEFAULT_MAX_CONCURRENCY):
+    """Return ({blob name: properties}, prefixes) for a container.
+
+    Without `prefixes`, the top level of the container is walked first and its
+    folders are used as the prefixes. Each prefix is then listed in its own
+    thread.
+    """
+    blobs = {}
+    try:
+        if prefixes is None:
+            prefixes = []
+            for item in container_client.walk_blobs(include=LIST_INCLUDE, delimiter=DELIMITER):
+                if item.name.endswith(DELIMITER):
+                    prefixes.append(item.name)
+                else:
+                    blobs[item.name] = item
+        listings = parallel.thread_map(
+            lambda prefix: list(container_client.list_blobs(name_starts_with=prefix, include=LIST_INCLUDE)),
+            prefixes, max_concurrency)
+    except ResourceNotFoundError:
+        # A container that does not exist yet is empty
+        return {}, prefixes or []
+    for listing in listings:
+        blobs.update((blob.name, blob) for blob in listing)
+    return blobs, prefixes
+
+
+def _etag(properties):
+    return (properties.etag or '').strip('"')
+
+
+def _copy_status(properties):
+    copy = getattr(properties, 'copy', None)
+    return getattr(copy, 'status', None)
+
+
+def plan(source, target):
+    """SKIPPED if `target` is a current copy of `source`, PENDING if it is still being copied, else COPIED."""
+    if target is None:
+        return COPIED
+    recorded_etag = (target.metadata or {}).get(SOURCE_ETAG_KEY)
+    source_md5 = source.content_settings.content_md5
+    current = recorded_etag == _etag(source) or (
+        bool(source_md5) and source_md5 == target.content_settings.content_md5)
+    status = _copy_status(target)
+    if current and status == 'pending':
+        return PENDING
+    if current and status in (None, 'success'):
+        return SKIPPED
+    return COPIED
+
+
+def promote(source_container, target_container, select=None, prefixes=None,
+            max_concurrency=parallel.DEFAULT_MAX_CONCURRENCY, timeout=60.0, poll_interval=1.0):
+    """Copy the blobs of `source_container` accepted by `select(name)` into `target_container`.
+
+    Names are kept. Returns a dict with the number of blobs COPIED, SKIPPED
+    (already current) and still PENDING at the timeout, the names that FAILED,
+    and the total 'seconds'.
+    """
+    start = time.perf_counter()
+    source_blobs, _ = list_partitioned(source_container, prefixes, max_concurrency)
+    target_blobs, _ = list_partitioned(target_container, prefixes, max_concurrency)
+
+    to_copy, to_poll = [], []
+    skipped = 0
+    for name in sorted(source_blobs):
+        if select is not None and not select(name):
+            continue
+        action = plan(source_blobs[name], target_blobs.get(name))
+        if action == SKIPPED:
+            skipped += 1
+        elif action == PENDING:
+            to_poll.append(name)
+        else:
+            to_copy.append(name)
+
+    def start_copy(name):
+        source = source_blobs[name]
+        metadata = dict(source.metadata or {})
+        metadata[SOURCE_ETAG_KEY] = _etag(source)
+        source_url = source_container.get_blob_client(name).url
+        try:
+            result = target_container.get_blob_client(name).start_copy_from_url(source_url, metadata=metadata)
+        except Exception as e:
+            logging.warning(f"Could not copy {name}: {e}")
+            return FAILED
+        return result['copy_status']
+
+    # Start every copy; most small blobs finish synchronously
+    statuses = dict(zip(to_copy, parallel.thread_map(start_copy, to_copy, max_concurrency)))
+    statuses.update((name, 'pending') for name in to_poll)
+
+    # Poll the pending copies until they finish or the timeout passes
+    deadline = time.monotonic() + timeout
+    pending = [name for name, status in statuses.items() if status == 'pending']
+    while pending and time.monotonic() < deadline:
+        time.sleep(min(poll_interval, max(0.0, deadline - time.monotonic())))
+        polled = parallel.thread_map(
+            lambda name: _copy_status(target_container.get_blob_client(name).get_blob_properties()),
+            pending, max_concurrency)
+        statuses.update(zip(pending, polled))
+        pending = [name for name in pending if statuses[name] == 'pending']
+
+    failed = sorted(name for name, status in statuses.items() if status not in ('success', 'pending'))
+    return {
+        COPIED: sum(1 for status in statuses.values() if status == 'success'),
+        SKIPPED: skipped,
+        PENDING: len(pending),
+        FAILED: failed,
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,50 @@
+"""Deterministic train/test assignment by hashing a key column.
+
+Each key (e.g. SEQN) is hashed on its own, with a seed, and the hash picks
+its side. A participant is therefore always in the same set, whatever other
+rows, row order or chunking the frame has, and a frame can be split chunk by
+chunk without shuffling or copying it. For distinct keys the test share is
+`test_size` up to sampling noise (about 0.5 percentage points for 10k keys).
+
+random_split is the original shuffled split, without importing scikit-learn.
+"""
+import math
+
+from shared_code import lazy
+
+np = lazy.module('numpy')
+
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _splitmix64(values):
+    # Finaliser of the SplitMix64 generator: a fast, well-mixed 64-bit hash of each value
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def in_test_set(keys, test_size, seed=42):
+    """Boolean array, True for the rows whose key belongs to the test set.
+
+    `keys` are integers (integral floats are accepted, as SEQN is often read
+    as float64).
+    """
+    keys = np.asarray(keys).astype(np.int64).view(np.uint64)
+    with np.errstate(over='ignore'):
+        hashed = _splitmix64(keys + np.uint64(seed) * np.uint64(_GOLDEN_GAMMA))
+    # The top 53 bits as a uniform number in [0, 1)
+    return (hashed >> np.uint64(11)) * (1.0 / (1 << 53)) < test_size
+
+
+def random_split(n_rows, test_size, seed=42):
+    """Row positions (train, test) of sklearn's train_test_split(test_size=test_size, random_state=seed).
+
+    The same draw as its ShuffleSplit: ceil(test_size * n_rows) test rows
+    from the front of a RandomState(seed) permutation, the rest for training.
+    """
+    n_test = math.ceil(test_size * n_rows)
+    permutation = np.random.RandomState(seed).permutation(n_rows)
+    return permutation[n_test:], permutation[:n_test]
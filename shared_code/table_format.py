@@ -0,0 +1,187 @@
+"""Reading and writing the tables passed between the pipeline's layers.
+
+Each layer can store its output as CSV (the original format) or Parquet,
+which keeps column types, per-column statistics and compression, and lets
+readers load only the columns they need. Readers detect the format from
+the data itself, so a container may hold a mix of both.
+"""
+import io
+import logging
+import os
+
+from shared_code import lazy
+
+# Imported on first use, so loading this module does not slow the worker's cold start
+np = lazy.module('numpy')
+pd = lazy.module('pandas')
+pa = lazy.module('pyarrow')
+pq = lazy.module('pyarrow.parquet')
+
+CSV = 'csv'
+PARQUET = 'parquet'
+FILE_EXTENSIONS = {CSV: '.csv', PARQUET: '.parquet'}
+PARQUET_MAGIC = b'PAR1'
+PARQUET_COMPRESSION = os.environ.get('PARQUET_COMPRESSION', 'snappy')
+
+
+def output_format(setting):
+    """Format configured by app setting `setting`, falling back to OUTPUT_FORMAT, then CSV."""
+    value = os.environ.get(setting) or os.environ.get('OUTPUT_FORMAT') or CSV
+    value = value.lower()
+    if value not in FILE_EXTENSIONS:
+        raise ValueError(f"{setting} must be one of {sorted(FILE_EXTENSIONS)}, not '{value}'.")
+    return value
+
+
+def detect_format(data):
+    """Return PARQUET if `data` (bytes) is a Parquet file, otherwise CSV."""
+    if data[:4] == PARQUET_MAGIC and data[-4:] == PARQUET_MAGIC:
+        return PARQUET
+    return CSV
+
+
+def read_table(data, columns=None, dtypes=None):
+    """Read CSV or Parquet bytes into a DataFrame with upper-cased column names.
+
+    `columns` is a collection of upper-case column names to load; other
+    columns are skipped while parsing. Names that are not in the file are
+    ignored. None loads every column. `dtypes` ({upper-case name: dtype})
+    converts the columns it names with `apply_dtypes`; floating point
+    columns are parsed straight into their dtype.
+    """
+    wanted = None if columns is None else {column.upper() for column in columns}
+    if detect_format(data) == PARQUET:
+        parquet_file = pq.ParquetFile(io.BytesIO(data))
+        names = parquet_file.schema_arrow.names
+        if wanted is not None:
+            names = [name for name in names if name.upper() in wanted]
+        df = parquet_file.read(columns=names).to_pandas()
+    else:
+        # Integer columns are parsed as floats and converted below, which tolerates values like 1.0
+        parse_dtypes = {name: dtype for name, dtype in (dtypes or {}).items() if pd.api.types.is_float_dtype(dtype)}
+        usecols = None if wanted is None else (lambda name: name.upper() in wanted)
+        df = pd.read_csv(io.BytesIO(data), usecols=usecols, dtype=parse_dtypes or None)
+    df.columns = df.columns.str.upper()
+    if dtypes:
+        df = apply_dtypes(df, dtypes)
+    return df
+
+
+def apply_dtypes(df, dtypes):
+    """Convert the columns of `df` named in `dtypes` ({name: dtype}); others are left as they are.
+
+    Integer dtypes accept floats within 1e-6 of an integer, such as the
+    5.4e-79 pandas reads for a SAS zero. A column with fractional values or
+    values outside the integer dtype's range keeps its dtype (with a warning)
+    rather than losing data.
+    """
+    converted = {}
+    for name, dtype in dtypes.items():
+        if name not in df.columns:
+            continue
+        dtype = pd.api.types.pandas_dtype(dtype)
+        column = df[name]
+        if column.dtype == dtype:
+            continue
+        if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_numeric_dtype(column.dtype):
+            converted[name] = _to_integer(name, column, dtype)
+        else:
+            converted[name] = column.astype(dtype)
+    if converted:
+        # One assignment for all the columns instead of a copy of the frame per column
+        df = df.assign(**converted)
+    return df
+
+
+def _to_integer(name, column, dtype):
+    values = column.to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(values)
+    rounded = np.where(missing, 0, np.round(values))
+    numpy_dtype = np.dtype(getattr(dtype, 'numpy_dtype', dtype))
+    limits = np.iinfo(numpy_dtype)
+    if (np.abs(np.where(missing, 0, values) - rounded) > 1e-6).any():
+        logging.warning(f"Column {name} has fractional values; keeping {column.dtype} instead of {dtype}.")
+        return column
+    if len(rounded) and (rounded.min() < limits.min or rounded.max() > limits.max):
+        logging.warning(f"Column {name} has values outside the {dtype} range; keeping {column.dtype}.")
+        return column
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return pd.Series(pd.arrays.IntegerArray(rounded.astype(numpy_dtype), missing), index=column.index)
+    if missing.any():
+        logging.warning(f"Column {name} has missing values; keeping {column.dtype} instead of {dtype}.")
+        return column
+    return pd.Series(rounded.astype(numpy_dtype), index=column.index)
+
+
+def parquet_schema(df, value_types=None):
+    """Arrow schema for writing `df`, or chunks of it, to Parquet with a TableWriter.
+
+    Taken from the first chunk, an object column with no values in that chunk
+    gets Arrow's null type, and a later chunk with values cannot be written.
+    Here an object column gets the type of its values in all of `df` (or
+    `value_types[name]`, an Arrow type, when `df` does not hold the values),
+    and float64 if it has none, as the pipeline's variables are numeric.
+    """
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for i, field in enumerate(schema):
+        if not pa.types.is_null(field.type):
+            continue
+        value_type = pa.infer_type(df[field.name].to_numpy(), from_pandas=True) if len(df) else pa.null()
+        if pa.types.is_null(value_type):
+            value_type = (value_types or {}).get(field.name, pa.null())
+        schema = schema.set(i, field.with_type(pa.float64() if pa.types.is_null(value_type) else value_type))
+    return schema
+
+
+class TableWriter:
+    """Write DataFrames in chunks to a binary file-like object as CSV or Parquet.
+
+    All chunks must have the same columns. For Parquet, `schema` (see
+    parquet_schema) gives the column types; without it they are taken from the
+    first chunk. `close()` finishes the table but leaves `file` open.
+    """
+
+    def __init__(self, file, table_format, schema=None):
+        self._file = file
+        self._format = table_format
+        self._columns = None
+        self._parquet_writer = None
+        self._schema = schema
+        self.rows = 0
+
+    def write(self, df):
+        if self._columns is None:
+            self._columns = list(df.columns)
+        if self._format == PARQUET:
+            if self._parquet_writer is None:
+                if self._schema is None:
+                    self._schema = pa.Schema.from_pandas(df, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(
+                    self._file, self._schema, compression=PARQUET_COMPRESSION, write_statistics=True)
+            self._parquet_writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        else:
+            # Only the first chunk carries the header row
+            self._file.write(df.to_csv(index=False, header=self.rows == 0).encode('utf-8'))
+        self.rows += len(df)
+
+    def close(self, columns=None):
+        """Finish the table. `columns` gives the header for a table with no chunks."""
+        if self._columns is None:
+            # Still write the header (or schema) for an empty table
+            self.write(pd.DataFrame(columns=columns or []))
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def write_table(df, file, table_format):
+    """Write a whole DataFrame to a binary file-like object."""
+    writer = TableWriter(file, table_format)
+    writer.write(df)
+    writer.close()
+
+
+def table_bytes(df, table_format):
+    buffer = io.BytesIO()
+    write_table(df, buffer, table_format)
+    return buffer.getvalue()
@@ -0,0 +1,266 @@
+"""Per-stage timings, sizes and row counts of each invocation, as structured metrics.
+
+A function's main() is wrapped with `@telemetry.instrument('GoldLevel')`, and
+the code it runs, including shared code and the threads of parallel.thread_map,
+opens spans around its stages:
+
+    with telemetry.span('gold.download', file=blob_name) as span:
+        data = blob_client.download_blob().readall()
+        span.record(bytes=len(data))
+
+Every span becomes Application Insights custom metrics, `<stage>.seconds` and
+one `<stage>.<measure>` per recorded measure, with the span's dimensions,
+the function and the invocation id as properties. They are sent in the
+background when an instrumentation key is configured (TELEMETRY_METRICS=off
+disables them). Each invocation also logs one JSON line with the totals per
+stage. Spans opened outside an instrumented invocation cost nothing and are
+dropped.
+
+Profile mode, for local runs: with PIPELINE_PROFILE=true, or `?profile=true`
+on one HTTP request, the invocation also runs cProfile (on the invocation's
+own thread; pool threads show up as waiting, and in the spans) and
+tracemalloc, and writes a report to PIPELINE_PROFILE_DIR: the spans, the
+hottest functions, the top allocation sites and any memory_snapshot()s.
+"""
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+METRICS_MODE = os.environ.get('TELEMETRY_METRICS', 'auto').lower()
+PROFILE = os.environ.get('PIPELINE_PROFILE', 'false').lower() in ('1', 'true', 'yes', 'on')
+PROFILE_DIR = os.environ.get('PIPELINE_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'pipeline-profiles'))
+# Lines of each listing in the profile report
+PROFILE_TOP = 30
+
+_current = contextvars.ContextVar('telemetry_invocation', default=None)
+_client_lock = threading.Lock()
+_client = None
+
+
+class Span:
+    __slots__ = ('stage', 'dimensions', 'seconds', 'measures')
+
+    def __init__(self, stage, dimensions):
+        self.stage = stage
+        self.dimensions = dimensions
+        self.seconds = 0.0
+        self.measures = {}
+
+    def record(self, **measures):
+        """Add to the span's measures, e.g. record(bytes=len(data), rows=len(df))."""
+        for name, value in measures.items():
+            self.measures[name] = self.measures.get(name, 0) + value
+
+
+class _NullSpan:
+    def record(self, **measures):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Invocation:
+    def __init__(self, function, profile):
+        self.function = function
+        self.id = uuid.uuid4().hex
+        self.profile = profile
+        self.spans = []
+        self.snapshots = []
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """Totals per stage: count, seconds and every measure."""
+        stages = {}
+        for span in self.spans:
+            totals = stages.setdefault(span.stage, {'count': 0, 'seconds': 0.0})
+            totals['count'] += 1
+            totals['seconds'] += span.seconds
+            for name, value in span.measures.items():
+                totals[name] = totals.get(name, 0) + value
+        for totals in stages.values():
+            totals['seconds'] = round(totals['seconds'], 4)
+        return stages
+
+
+@contextlib.contextmanager
+def span(stage, **dimensions):
+    """Time the enclosed block as one `stage` of the current invocation (a None stage records nothing)."""
+    invocation = _current.get()
+    if invocation is None or stage is None:
+        yield _NULL_SPAN
+        return
+    current = Span(stage, dimensions)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        invocation.add(current)
+
+
+def memory_snapshot(label):
+    """In profile mode, record the traced memory and its top allocation sites at this point."""
+    invocation = _current.get()
+    if invocation is None or not invocation.profile or not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+    invocation.snapshots.append({'label': label, 'current_mib': current / 2**20, 'peak_mib': peak / 2**20,
+                                 'top': [str(stat) for stat in top]})
+
+
+@contextlib.contextmanager
+def invocation(function, profile=False):
+    """Collect the spans of one invocation of `function`, then emit them."""
+    current = Invocation(function, profile or PROFILE)
+    token = _current.set(current)
+    profiler = None
+    started_tracing = False
+    if current.profile:
+        profiler = cProfile.Profile()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracemalloc.reset_peak()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            memory_snapshot('end')
+            if started_tracing:
+                tracemalloc.stop()
+        _current.reset(token)
+        try:
+            _emit(current)
+            if profiler is not None:
+                _write_profile(current, profiler)
+        except Exception as e:
+            # Telemetry must never fail an invocation
+            logging.warning(f"Could not emit telemetry for {function}: {e}")
+
+
+def instrument(function):
+    """Decorator for a function's main(): runs each call as an instrumented invocation.
+
+    An HTTP request with `?profile=true` (or "profile": true in its JSON body)
+    is profiled on its own.
+    """
+    def decorator(main):
+        @functools.wraps(main)
+        def wrapper(*args, **kwargs):
+            with invocation(function, profile=any(_asks_for_profile(arg) for arg in (*args, *kwargs.values()))):
+                return main(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _asks_for_profile(arg):
+    params = getattr(arg, 'params', None)
+    if params is None or not hasattr(arg, 'get_json'):
+        return False
+    if str(params.get('profile', '')).lower() in ('1', 'true', 'yes'):
+        return True
+    try:
+        body = arg.get_json() if arg.get_body() else {}
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get('profile') is True
+
+
+def _emit(current):
+    logging.info(f"Telemetry {current.function} {current.id}: "
+                 f"{json.dumps({'seconds': round(current.seconds, 4), 'stages': current.summary()})}")
+    client = _metrics_client()
+    if client is None:
+        return
+    # Each value is sent on its own (an aggregate of one); Application Insights aggregates them
+    for item in current.spans:
+        properties = {'function': current.function, 'invocation_id': current.id,
+                      **{name: str(value) for name, value in item.dimensions.items()}}
+        client.track_metric(f"{item.stage}.seconds", item.seconds, count=1, properties=properties)
+        for name, value in item.measures.items():
+            client.track_metric(f"{item.stage}.{name}", value, count=1, properties=properties)
+    client.track_metric(f"{current.function}.seconds", current.seconds, count=1,
+                        properties={'function': current.function, 'invocation_id': current.id})
+    # Hands the batch to the channel's background sender
+    client.flush()
+
+
+def _instrumentation_key():
+    """(key, ingestion endpoint or None) from the app settings the functions host uses."""
+    key = os.environ.get('APPINSIGHTS_INSTRUMENTATIONKEY')
+    endpoint = None
+    connection_string = os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING', '')
+    for part in connection_string.split(';'):
+        name, _, value = part.partition('=')
+        if name.strip().lower() == 'instrumentationkey':
+            key = key or value.strip()
+        elif name.strip().lower() == 'ingestionendpoint':
+            endpoint = value.strip().rstrip('/') + '/v2/track'
+    return key, endpoint
+
+
+def _metrics_client():
+    global _client
+    if METRICS_MODE == 'off':
+        return None
+    with _client_lock:
+        if _client is None:
+            key, endpoint = _instrumentation_key()
+            if not key:
+                _client = False
+            else:
+                from applicationinsights import TelemetryClient, channel
+
+                sender = channel.AsynchronousSender(endpoint) if endpoint else channel.AsynchronousSender()
+                _client = TelemetryClient(key, channel.TelemetryChannel(queue=channel.AsynchronousQueue(sender)))
+        return _client or None
+
+
+def _write_profile(current, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{current.function}-{datetime.now():%Y%m%d-%H%M%S}-{current.id[:8]}")
+    profiler.dump_stats(base + '.pstats')
+    hot = io.StringIO()
+    pstats.Stats(profiler, stream=hot).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    with open(base + '.json', 'w') as f:
+        json.dump({'function': current.function, 'invocation_id': current.id, 'seconds': current.seconds,
+                   'stages': current.summary(),
+                   'spans': [{'stage': item.stage, 'seconds': item.seconds, **item.dimensions, **item.measures}
+                             for item in current.spans],
+                   'memory': current.snapshots}, f, indent=1, default=str)
+    with open(base + '.txt', 'w') as f:
+        f.write(f"{current.function} invocation {current.id}: {current.seconds:.3f}s\n\n")
+        f.write(f"{'stage':<24} {'count':>6} {'seconds':>10}  measures\n")
+        for stage, totals in current.summary().items():
+            measures = ', '.join(f"{name} {value}" for name, value in totals.items() if name not in ('count', 'seconds'))
+            f.write(f"{stage:<24} {totals['count']:>6} {totals['seconds']:>10.3f}  {measures}\n")
+        for snapshot in current.snapshots:
+            f.write(f"\nMemory at {snapshot['label']}: {snapshot['current_mib']:.1f} MiB traced, "
+                    f"peak {snapshot['peak_mib']:.1f} MiB\n")
+            f.writelines(f"  {line}\n" for line in snapshot['top'])
+        f.write("\ncProfile, invocation thread, by cumulative time:\n")
+        f.write(hot.getvalue())
+    logging.info(f"Profile of {current.function} written to {base}.txt")
@@ -0,0 +1,155 @@
+"""XPT to CSV/Parquet conversion, shared by the single-blob trigger and batch conversion.
+
+XPTtoCSVconversion converts the one blob it is triggered by, uploading the
+output as staged blocks while it converts. XPTBatchConversion downloads many
+blobs to local files in threads and converts them file to file in a process
+pool (convert_file), so one function call can back-fill a whole release.
+"""
+import logging
+import os
+import io
+import shutil
+import tempfile
+import time
+
+from shared_code import lazy, parallel, table_format, telemetry, xport
+from shared_code.block_upload import BlockBlobWriter
+
+pd = lazy.module('pandas')
+
+# 'streaming' converts the XPT in record chunks and uploads the output as staged
+# blocks, so memory is bounded by the chunk size. 'buffered' is the original
+# whole-file path, kept for comparison and as a fallback.
+CONVERSION_MODE = os.environ.get('XPT_CONVERSION_MODE', 'streaming')
+# Number of XPT records decoded and written per chunk
+CHUNK_ROWS = int(os.environ.get('XPT_CHUNK_ROWS', '50000'))
+# Input blobs larger than this are spooled to local disk instead of memory
+SPOOL_MAX_BYTES = int(os.environ.get('XPT_SPOOL_MAX_BYTES', str(16 * 1024 * 1024)))
+COPY_BUFFER_BYTES = 1024 * 1024
+# 'csv' or 'parquet' (falls back to the app-wide OUTPUT_FORMAT setting)
+OUTPUT_FORMAT = table_format.output_format('XPT_OUTPUT_FORMAT')
+OUTPUT_CONTAINER = 'bronze-level'
+
+def get_or_create_container(blob_service_client, container_name):
+    container_client = blob_service_client.get_container_client(container_name)
+    try:
+        container_client.create_container()
+        logging.info(f"Container '{container_name}' created.")
+    except Exception as e:
+        if not e.error_code == 'ContainerAlreadyExists':
+            raise
+
+def output_blob_path(blob_name, output_format=OUTPUT_FORMAT):
+    """Output path of an input blob: the file goes directly in its year folder.
+
+    `blob_name` is relative to the input container, e.g. '2017-2020/DEMO_J.XPT'
+    becomes '2017-2020/DEMO_J.csv'.
+    """
+    base_filename = os.path.splitext(os.path.basename(blob_name))[0]
+    # The year is assumed to be the first folder of the path
+    year_folder = blob_name.split('/')[0]
+    return f"{year_folder}/{base_filename}{table_format.FILE_EXTENSIONS[output_format]}"
+
+def spool_input(stream):
+    # The XPT reader needs a seekable file (it seeks to the end to count records),
+    # but the trigger's InputStream is not seekable. Copy it across in small pieces.
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(stream, spool, COPY_BUFFER_BYTES)
+    spool.seek(0)
+    return spool
+
+def convert_xpt(xpt_file, out, chunk_rows=CHUNK_ROWS, output_format=OUTPUT_FORMAT):
+    """Convert a seekable XPT file chunk by chunk into the binary file-like `out`.
+
+    Returns the number of rows written.
+    """
+    with xport.XportReader(xpt_file, chunksize=chunk_rows) as reader:
+        table_writer = table_format.TableWriter(out, output_format)
+        for chunk in reader:
+            table_writer.write(chunk)
+        table_writer.close(columns=reader.columns)
+    return table_writer.rows
+
+def convert_xpt_streaming(xpt_file, blob_client, chunk_rows=CHUNK_ROWS, output_format=OUTPUT_FORMAT):
+    """Convert a seekable XPT file chunk by chunk, uploading as staged blocks.
+
+    Returns the number of rows written.
+    """
+    with BlockBlobWriter(blob_client) as writer:
+        return convert_xpt(xpt_file, writer, chunk_rows, output_format)
+
+def convert_xpt_buffered(xpt_data, blob_client, output_format=OUTPUT_FORMAT):
+    """Convert XPT bytes in memory and upload in a single call.
+
+    Returns the number of rows written.
+    """
+    # Use a BytesIO stream to load into pandas
+    df = pd.read_sas(io.BytesIO(xpt_data), format='xport')
+
+    # Convert the DataFrame to CSV or Parquet bytes
+    output_bytes = table_format.table_bytes(df, output_format)
+
+    # Upload the data to the output blob
+    blob_client.upload_blob(output_bytes, blob_type="BlockBlob", overwrite=True)
+    return len(df)
+
+def convert_file(xpt_path, output_path, chunk_rows=CHUNK_ROWS, output_format=OUTPUT_FORMAT):
+    """Convert a local XPT file into a local output file; returns (rows, seconds).
+
+    Module-level, so it can run in a process pool.
+    """
+    start = time.perf_counter()
+    with open(xpt_path, 'rb') as xpt_file, open(output_path, 'wb') as out:
+        rows = convert_xpt(xpt_file, out, chunk_rows, output_format)
+    return rows, time.perf_counter() - start
+
+def convert_blobs(input_container_client, output_container_client, blob_names, processes,
+                  max_concurrency=parallel.DEFAULT_MAX_CONCURRENCY, output_format=OUTPUT_FORMAT):
+    """Convert many XPT blobs; returns one result dict per blob, in order.
+
+    Each blob is downloaded to a local temporary file and its output uploaded
+    from one in a pool of `max_concurrency` threads, while the conversions run
+    in `processes` worker processes (0 converts in the threads). A failed blob
+    gets an 'error' instead of stopping the others.
+    """
+    pool = parallel.process_pool(processes) if processes > 0 else None
+
+    def run(blob_name):
+        result = {'blob': blob_name, 'output': output_blob_path(blob_name, output_format)}
+        with tempfile.TemporaryDirectory(prefix='xpt-') as directory:
+            xpt_path = os.path.join(directory, 'input.xpt')
+            output_path = os.path.join(directory, 'output')
+            try:
+                start = time.perf_counter()
+                with telemetry.span('xpt.download', file=blob_name) as span:
+                    with open(xpt_path, 'wb') as xpt_file:
+                        input_container_client.get_blob_client(blob_name).download_blob().readinto(xpt_file)
+                    span.record(bytes=os.path.getsize(xpt_path))
+                result['download_seconds'] = time.perf_counter() - start
+
+                # Includes waiting for a free process
+                with telemetry.span('xpt.convert', file=blob_name) as span:
+                    args = (xpt_path, output_path, CHUNK_ROWS, output_format)
+                    if pool is None:
+                        result['rows'], result['convert_seconds'] = convert_file(*args)
+                    else:
+                        result['rows'], result['convert_seconds'] = pool.submit(convert_file, *args).result()
+                    span.record(rows=result['rows'])
+
+                start = time.perf_counter()
+                with telemetry.span('xpt.upload', file=result['output']) as span, open(output_path, 'rb') as output, \
+                        BlockBlobWriter(output_container_client.get_blob_client(result['output'])) as writer:
+                    shutil.copyfileobj(output, writer, COPY_BUFFER_BYTES)
+                    span.record(bytes=writer.bytes_written)
+                result['upload_seconds'] = time.perf_counter() - start
+            except Exception as e:
+                logging.error(f"Error converting blob {blob_name}: {e}")
+                result['error'] = str(e)
+        return result
+
+    try:
+        # Enough threads to keep every process busy while others download or upload
+        return parallel.thread_map(run, blob_names, max(max_concurrency, processes))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
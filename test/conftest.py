@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import shared_code and the functions as the functions host does, from the app's root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared_code import datasets
+
+CATALOG = datasets.DatasetCatalog()
+EARLIER = datetime(2024, 1, 1)
+LATER = EARLIER + timedelta(hours=1)
+
+
+def selected(*blobs, preferred_extension=None):
+    candidates = [(CATALOG.classify(name), last_modified) for name, last_modified in blobs]
+    return [dataset_file.blob_name for dataset_file in datasets.select_files(candidates, preferred_extension)]
+
+
+def test_classify():
+    dataset_file = CATALOG.classify('2003-2004/SMQFAM_C.parquet')
+    assert (dataset_file.dataset, dataset_file.year) == ('SMQFAM', '2003-2004')
+    assert CATALOG.classify('2003-2004/EXTRA_C.csv') is None
+
+
+def test_one_file_per_dataset_is_kept_in_order():
+    blobs = [('2003-2004/DEMO_C.csv', EARLIER), ('2003-2004/BMX_C.csv', EARLIER), ('2005-2006/DEMO_D.csv', EARLIER)]
+    assert selected(*blobs) == [name for name, _ in blobs]
+
+
+def test_mixed_formats_keep_the_preferred_format():
+    blobs = [('2003-2004/DEMO_C.parquet', EARLIER), ('2003-2004/BMX_C.csv', EARLIER), ('2003-2004/DEMO_C.csv', LATER)]
+    assert selected(*blobs, preferred_extension='.parquet') == ['2003-2004/DEMO_C.parquet', '2003-2004/BMX_C.csv']
+    assert selected(*blobs, preferred_extension='.csv') == ['2003-2004/BMX_C.csv', '2003-2004/DEMO_C.csv']
+
+
+def test_mixed_formats_without_the_preferred_format_keep_the_newest():
+    blobs = [('2003-2004/DEMO_C.parquet', LATER), ('2003-2004/DEMO_C.csv', EARLIER)]
+    assert selected(*blobs) == ['2003-2004/DEMO_C.parquet']
+    assert selected(*blobs, preferred_extension='.xpt') == ['2003-2004/DEMO_C.parquet']
+
+
+def test_same_format_twice_is_an_error():
+    with pytest.raises(ValueError, match='More than one DEMO file in 2003-2004'):
+        selected(('2003-2004/DEMO_C.csv', EARLIER), ('2003-2004/DEMO_D.csv', LATER))
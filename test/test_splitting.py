@@ -0,0 +1,53 @@
+import math
+
+import numpy as np
+import pytest
+
+from shared_code import splitting
+
+SEQN = np.arange(1, 100_001)
+
+
+@pytest.mark.parametrize('test_size', [0.1, 0.3, 0.5])
+@pytest.mark.parametrize('seed', [0, 42, 2024])
+def test_test_share_is_close_to_test_size(test_size, seed):
+    # 100k keys: the sampling noise is below 0.2 percentage points
+    assert splitting.in_test_set(SEQN, test_size, seed).mean() == pytest.approx(test_size, abs=0.01)
+
+
+def test_assignment_is_deterministic_and_seeded():
+    first = splitting.in_test_set(SEQN, 0.3, seed=42)
+    assert np.array_equal(first, splitting.in_test_set(SEQN, 0.3, seed=42))
+    assert not np.array_equal(first, splitting.in_test_set(SEQN, 0.3, seed=43))
+
+
+def test_assignment_does_not_depend_on_row_order_or_chunks():
+    expected = dict(zip(SEQN, splitting.in_test_set(SEQN, 0.3)))
+    shuffled = np.random.default_rng(0).permutation(SEQN)
+    chunks = np.array_split(shuffled, [1, 500, 12_345, 60_000])
+    assigned = np.concatenate([splitting.in_test_set(chunk, 0.3) for chunk in chunks])
+    assert all(expected[key] == test for key, test in zip(shuffled, assigned))
+
+
+def test_float_keys_match_integer_keys():
+    assert np.array_equal(splitting.in_test_set(SEQN.astype('float64'), 0.3), splitting.in_test_set(SEQN, 0.3))
+
+
+@pytest.mark.parametrize('n_rows', [1, 7, 10, 1000, 14_061])
+@pytest.mark.parametrize('test_size', [0.3, 0.25])
+def test_random_split_partitions_the_rows(n_rows, test_size):
+    train, test = splitting.random_split(n_rows, test_size, seed=42)
+    assert len(test) == math.ceil(test_size * n_rows)
+    assert sorted(np.concatenate([train, test])) == list(range(n_rows))
+
+
+@pytest.mark.parametrize('n_rows', [7, 10, 1000, 14_061])
+@pytest.mark.parametrize('seed', [0, 42])
+def test_random_split_matches_train_test_split(n_rows, seed):
+    # scikit-learn is not one of the app's requirements; the split only has to give its rows
+    model_selection = pytest.importorskip('sklearn.model_selection')
+    expected_train, expected_test = model_selection.train_test_split(np.arange(n_rows), test_size=0.3,
+                                                                     random_state=seed)
+    train, test = splitting.random_split(n_rows, 0.3, seed)
+    assert np.array_equal(train, expected_train)
+    assert np.array_equal(test, expected_test)
@@ -0,0 +1,40 @@
+import io
+
+import pandas as pd
+import pytest
+
+from shared_code import partitions, table_format
+
+# Like the language columns GoldLevel adds as nulls for the cycles before 2003-2004
+FRAME = pd.DataFrame({'SEQN': [1.0, 2.0, 3.0, 4.0], 'FIALANG': [None, None, 1.0, 2.0], 'EMPTY': [None] * 4},
+                     dtype=object).astype({'SEQN': 'float64'})
+
+
+def write_chunks(chunks, schema):
+    buffer = io.BytesIO()
+    writer = table_format.TableWriter(buffer, table_format.PARQUET, schema=schema)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    return table_format.read_table(buffer.getvalue())
+
+
+def test_first_chunk_schema_cannot_take_later_values():
+    with pytest.raises(Exception, match='FIALANG'):
+        write_chunks([FRAME.iloc[:2], FRAME.iloc[2:]], schema=None)
+
+
+def test_parquet_schema_writes_every_chunk():
+    df = write_chunks([FRAME.iloc[:2], FRAME.iloc[2:]], table_format.parquet_schema(FRAME))
+    assert df['FIALANG'].tolist()[2:] == [1.0, 2.0] and df['FIALANG'].isna().sum() == 2
+    assert df['EMPTY'].dtype == 'float64' and df['EMPTY'].isna().all()
+
+
+def test_parquet_schema_of_spilled_frame(tmp_path):
+    with partitions.SpilledFrame(tmp_path) as spilled:
+        spilled.append(FRAME.iloc[:2])
+        spilled.append(FRAME.iloc[2:])
+        schema = table_format.parquet_schema(spilled.schema, spilled.value_types)
+        df = write_chunks(spilled.chunks(2), schema)
+    assert schema.field('FIALANG').type == 'double'
+    pd.testing.assert_frame_equal(df, write_chunks([FRAME], table_format.parquet_schema(FRAME)))